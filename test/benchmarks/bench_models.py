@@ -0,0 +1,106 @@
+"""
+Compares parse time and allocations of the lazy response models against the old recursive SimpleNamespace conversion.
+
+Usage: python -m test.benchmarks.bench_models
+"""
+import json
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from toxic_bot.helpers.models import Score, loads
+
+
+def make_scores_response(count: int = 100) -> bytes:
+    scores = []
+    for i in range(count):
+        scores.append({
+            'id': 4000000000 + i, 'user_id': 2, 'accuracy': 0.9812, 'max_combo': 1234, 'mode': 'osu', 'mode_int': 0,
+            'mods': ['HD', 'DT'], 'passed': True, 'perfect': False, 'pp': 312.5, 'rank': 'SH', 'replay': True,
+            'score': 12345678, 'created_at': '2022-05-01T12:00:00Z', 'best_id': 123, 'type': 'score_best_osu',
+            'statistics': {'count_100': 12, 'count_300': 900, 'count_50': 1, 'count_geki': 200, 'count_katu': 8,
+                           'count_miss': 0},
+            'beatmap': {'beatmapset_id': 1000 + i, 'difficulty_rating': 6.12, 'id': 3000 + i, 'mode': 'osu',
+                        'status': 'ranked', 'total_length': 201, 'user_id': 3, 'version': 'Extra', 'accuracy': 9,
+                        'ar': 9.3, 'bpm': 180, 'convert': False, 'count_circles': 600, 'count_sliders': 300,
+                        'count_spinners': 1, 'cs': 4, 'deleted_at': None, 'drain': 5, 'hit_length': 190,
+                        'is_scoreable': True, 'last_updated': '2021-01-01T00:00:00Z', 'mode_int': 0,
+                        'passcount': 1000, 'playcount': 20000, 'ranked': 1,
+                        'url': f'https://osu.ppy.sh/beatmaps/{3000 + i}', 'checksum': 'd41d8cd98f00b204e9800998ecf8427e'},
+            'beatmapset': {'artist': 'Artist', 'artist_unicode': 'Artist', 'creator': 'Mapper', 'favourite_count': 100,
+                           'id': 1000 + i, 'nsfw': False, 'play_count': 100000, 'preview_url': '//b.ppy.sh/preview/1.mp3',
+                           'source': '', 'status': 'ranked', 'title': 'Title', 'title_unicode': 'Title', 'user_id': 3,
+                           'video': False,
+                           'covers': {'cover': 'https://assets.ppy.sh/beatmaps/1/covers/cover.jpg',
+                                      'cover@2x': 'https://assets.ppy.sh/beatmaps/1/covers/cover@2x.jpg',
+                                      'card': 'https://assets.ppy.sh/beatmaps/1/covers/card.jpg',
+                                      'card@2x': 'https://assets.ppy.sh/beatmaps/1/covers/card@2x.jpg',
+                                      'list': 'https://assets.ppy.sh/beatmaps/1/covers/list.jpg',
+                                      'list@2x': 'https://assets.ppy.sh/beatmaps/1/covers/list@2x.jpg',
+                                      'slimcover': 'https://assets.ppy.sh/beatmaps/1/covers/slimcover.jpg',
+                                      'slimcover@2x': 'https://assets.ppy.sh/beatmaps/1/covers/slimcover@2x.jpg'}},
+            'user': {'avatar_url': 'https://a.ppy.sh/2', 'country_code': 'TR', 'default_group': 'default', 'id': 2,
+                     'is_active': True, 'is_bot': False, 'is_deleted': False, 'is_online': False,
+                     'is_supporter': True, 'last_visit': None, 'pm_friends_only': False, 'profile_colour': None,
+                     'username': 'heyronii'},
+            'weight': {'percentage': 100, 'pp': 312.5},
+        })
+    return json.dumps(scores).encode('utf-8')
+
+
+def format_dict(d: dict) -> SimpleNamespace:
+    new_dict = {}
+    for key, value in d.items():
+        if isinstance(value, dict):
+            new_dict[key] = format_dict(value)
+        else:
+            new_dict[key] = value
+    return SimpleNamespace(**new_dict)
+
+
+def wrap_namespace(contents: list):
+    return [format_dict(r) for r in contents]
+
+
+def wrap_models(contents: list):
+    return [Score(r) for r in contents]
+
+
+def read_listing_fields(scores):
+    # Fields a score listing actually reads
+    for score in scores:
+        _ = score.beatmap.version, score.beatmapset.title, score.pp, score.created_at
+
+
+def measure(name: str, decode, wrap, raw: bytes, rounds: int = 200):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        read_listing_fields(wrap(decode(raw)))
+    parse_time = (time.perf_counter() - start) / rounds
+
+    # Cache hits only wrap the already decoded JSON
+    contents = decode(raw)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        read_listing_fields(wrap(contents))
+    wrap_time = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    scores = wrap(contents)
+    read_listing_fields(scores)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{name:<16} {parse_time * 1000:14.3f} {wrap_time * 1000:16.3f} {allocated / 1024:16.1f}')
+
+
+def main():
+    raw = make_scores_response()
+    print(f'Response of {len(raw) / 1024:.1f} KiB with 100 scores')
+    print(f'{"":<16} {"decode+wrap ms":>14} {"wrap ms (cached)":>16} {"KiB per wrap":>16}')
+    measure('SimpleNamespace', json.loads, wrap_namespace, raw)
+    measure('models', loads, wrap_models, raw)
+
+
+if __name__ == '__main__':
+    main()
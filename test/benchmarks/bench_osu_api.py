@@ -0,0 +1,82 @@
+"""
+Drives concurrent get_user/get_beatmap calls through OsuApiV2 against the local osu! API stand-in and reports
+throughput, latency percentiles and how many requests actually reached the server.
+
+Usage: python -m test.benchmarks.bench_osu_api --calls 5000 --distinct-ids 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from test.fake_osu_api import FakeOsuApi
+from toxic_bot.helpers.cache import ResponseCache
+from toxic_bot.helpers.http_pool import HttpPool
+from toxic_bot.helpers.metrics import LatencyStats
+from toxic_bot.helpers.osu_api import OsuApiUnavailable, OsuApiV2
+
+
+async def run(args):
+    async with FakeOsuApi(latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                          rate_limit=args.rate_limit, rate_limit_window=args.rate_limit_window,
+                          retry_after=args.retry_after, seed=args.seed) as fake:
+        cache = ResponseCache(max_entries=0) if args.no_cache else None
+        api = OsuApiV2('client-id', 'client-secret', 'session-key', requests_per_second=args.rate, burst=args.burst,
+                       cache=cache, osu_url=fake.url)
+        rng = random.Random(args.seed)
+        latencies = LatencyStats(max_samples=args.calls)
+        semaphore = asyncio.Semaphore(args.concurrency)
+        failures = 0
+
+        async def call(i: int):
+            nonlocal failures
+            object_id = rng.randint(1, args.distinct_ids)
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    if i % 2:
+                        await api.get_user(object_id)
+                    else:
+                        await api.get_beatmap(object_id)
+                except OsuApiUnavailable:
+                    failures += 1
+                latencies.add(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[call(i) for i in range(args.calls)])
+        elapsed = time.perf_counter() - start
+
+        summary = latencies.summary()
+        print(f'{args.calls} calls in {elapsed:.2f}s: {args.calls / elapsed:.1f} calls/s, {failures} failed')
+        print(f'latency ms: mean {summary["mean"] * 1000:.2f}, p50 {summary["p50"] * 1000:.2f}, '
+              f'p99 {summary["p99"] * 1000:.2f}, max {summary["max"] * 1000:.2f}')
+        print(f'server requests: {dict(fake.requests)}')
+        print(f'server responses: {dict(fake.responses)}')
+        stats = api.stats()
+        print(f'cache: {stats["cache"]}')
+        print(f'rate limiter: {stats["rate_limiter"]}')
+
+        await api.close()
+        await HttpPool().close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test OsuApiV2 against a local osu! API stand-in.')
+    parser.add_argument('--calls', type=int, default=2000, help='Number of get_user/get_beatmap calls.')
+    parser.add_argument('--concurrency', type=int, default=1000, help='Calls running at the same time.')
+    parser.add_argument('--distinct-ids', type=int, default=100, help='Number of distinct user and beatmap ids.')
+    parser.add_argument('--rate', type=float, default=1000, help='Client side requests per second.')
+    parser.add_argument('--burst', type=int, default=100, help='Client side request burst.')
+    parser.add_argument('--latency', type=float, default=0.05, help='Server response delay in seconds.')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='Random extra server delay in seconds.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 500.')
+    parser.add_argument('--rate-limit', type=int, default=None, help='Server requests per window before 429s.')
+    parser.add_argument('--rate-limit-window', type=float, default=60.0, help='Server rate limit window in seconds.')
+    parser.add_argument('--retry-after', type=float, default=1, help='Retry-After sent with 429s.')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the response cache.')
+    parser.add_argument('--seed', type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
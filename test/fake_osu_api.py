@@ -0,0 +1,223 @@
+"""
+Local stand-in for the osu! endpoints used by OsuApiV2.
+
+Serves the fixtures in test/fixtures/osu_api with configurable latency, server errors and rate limiting,
+and counts the requests it receives per route.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import zlib
+from collections import Counter
+from typing import Iterable, Optional
+
+from aiohttp import web
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'osu_api')
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES_PATH, name), 'rb') as f:
+        contents = f.read()
+    return json.loads(contents) if name.endswith('.json') else contents
+
+
+class FakeOsuApi:
+    """
+    aiohttp server that answers like osu.ppy.sh. Use `url` as the `osu_url` of OsuApiV2.
+    """
+
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: Optional[int] = None, rate_limit_window: float = 60.0, retry_after: float = 1,
+                 score_count: int = 100, unknown_users: Iterable[str] = (), unknown_beatmaps: Iterable[int] = (),
+                 seed: Optional[int] = None):
+        """
+        :param latency: Seconds every response is delayed.
+        :param latency_jitter: Random extra delay of up to this many seconds.
+        :param error_rate: Fraction of requests answered with a 500.
+        :param rate_limit: Requests allowed per window before answering with 429.
+        :param rate_limit_window: Length of a rate limit window in seconds.
+        :param retry_after: Retry-After header sent with 429 responses.
+        :param score_count: Number of scores every user has.
+        :param unknown_users: Ids or usernames answered with 404.
+        :param unknown_beatmaps: Beatmap ids answered with 404.
+        :param seed: Seed of the error and jitter randomness.
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.retry_after = retry_after
+        self.score_count = score_count
+        self.unknown_users = {str(user).lower() for user in unknown_users}
+        self.unknown_beatmaps = {int(beatmap_id) for beatmap_id in unknown_beatmaps}
+        self._random = random.Random(seed)
+
+        self.requests = Counter()
+        self.responses = Counter()
+        self.access_token = None
+        self._issued_tokens = 0
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+
+        self._user = load_fixture('user.json')
+        self._beatmap = load_fixture('beatmap.json')
+        self._scores = load_fixture('scores.json')
+        self._beatmap_user_score = load_fixture('beatmap_user_score.json')
+        self._country_scores = load_fixture('country_scores.json')
+        self._rankings = load_fixture('rankings.json')
+        self._beatmap_file = load_fixture('beatmap.osu')
+
+        self._runner = None
+        self.url = None
+
+    async def __aenter__(self) -> 'FakeOsuApi':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def start(self):
+        app = web.Application(middlewares=[self._middleware])
+        app.add_routes([web.post('/oauth/token', self._token, name='token'),
+                        web.get('/api/v2/users/{user}/scores/{type}', self._user_scores, name='user_scores'),
+                        web.get('/api/v2/users/{user}{mode:(/(osu|taiko|fruits|mania))?}', self._get_user,
+                                name='user'),
+                        web.get('/api/v2/beatmaps', self._beatmaps, name='beatmaps'),
+                        web.get('/api/v2/beatmaps/{beatmap}', self._get_beatmap, name='beatmap'),
+                        web.get('/api/v2/beatmaps/{beatmap}/scores/users/{user}', self._user_beatmap_score,
+                                name='user_beatmap_score'),
+                        web.get('/api/v2/rankings/{mode}/performance', self._rankings_handler, name='rankings'),
+                        web.get('/beatmaps/{beatmap}/scores', self._country_scores_handler, name='country_scores'),
+                        web.get('/osu/{beatmap}', self._beatmap_file_handler, name='beatmap_file')])
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f'http://{host}:{port}'
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def revoke_token(self):
+        """
+        Makes the current access token invalid, requests with it get a 401.
+        """
+        self.access_token = None
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        route = request.match_info.route.name
+        self.requests[route] += 1
+
+        delay = self.latency + self._random.uniform(0, self.latency_jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self._rate_limited():
+            response = web.json_response({'error': 'Too Many Attempts.'}, status=429,
+                                         headers={'Retry-After': str(self.retry_after)})
+        elif self.error_rate and self._random.random() < self.error_rate:
+            response = web.Response(status=500, text='<html>Internal Server Error</html>', content_type='text/html')
+        elif request.path.startswith('/api/v2/') and \
+                request.headers.get('Authorization') != f'Bearer {self.access_token}':
+            response = web.json_response({'authentication': 'basic'}, status=401)
+        else:
+            response = await handler(request)
+
+        self.responses[response.status] += 1
+        return response
+
+    def _rate_limited(self) -> bool:
+        if self.rate_limit is None:
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= self.rate_limit_window:
+            self._window_start = now
+            self._window_requests = 0
+        self._window_requests += 1
+        return self._window_requests > self.rate_limit
+
+    @staticmethod
+    def _not_found() -> web.Response:
+        return web.json_response({'error': None}, status=404)
+
+    async def _token(self, request: web.Request) -> web.Response:
+        self._issued_tokens += 1
+        self.access_token = f'fake-token-{self._issued_tokens}'
+        return web.json_response({'token_type': 'Bearer', 'expires_in': 86400, 'access_token': self.access_token})
+
+    async def _get_user(self, request: web.Request) -> web.Response:
+        user = request.match_info['user']
+        if user.lower() in self.unknown_users:
+            return self._not_found()
+
+        if request.query.get('key') == 'username' or not user.isdigit():
+            user_id = zlib.crc32(user.lower().encode()) % 10_000_000
+            username = user
+        else:
+            user_id = int(user)
+            username = f'{self._user["username"]}{user_id}'
+        return web.json_response(dict(self._user, id=user_id, username=username,
+                                      playmode=request.match_info['mode'].lstrip('/') or self._user['playmode']))
+
+    async def _user_scores(self, request: web.Request) -> web.Response:
+        user = request.match_info['user']
+        if user.lower() in self.unknown_users:
+            return self._not_found()
+
+        limit = min(int(request.query.get('limit', 50)), 100)
+        offset = int(request.query.get('offset', 0))
+        scores = []
+        for i in range(offset, min(offset + limit, self.score_count)):
+            score = self._scores[i % len(self._scores)]
+            user_id = int(user) if user.isdigit() else score['user_id']
+            scores.append(dict(score, id=score['id'] + i, user_id=user_id, user=dict(score['user'], id=user_id)))
+        return web.json_response(scores)
+
+    def _beatmap_for(self, beatmap_id: int) -> dict:
+        return dict(self._beatmap, id=beatmap_id, url=f'https://osu.ppy.sh/beatmaps/{beatmap_id}')
+
+    async def _get_beatmap(self, request: web.Request) -> web.Response:
+        beatmap_id = int(request.match_info['beatmap'])
+        if beatmap_id in self.unknown_beatmaps:
+            return self._not_found()
+        return web.json_response(self._beatmap_for(beatmap_id))
+
+    async def _beatmaps(self, request: web.Request) -> web.Response:
+        beatmap_ids = [int(beatmap_id) for beatmap_id in request.query.getall('ids[]', [])][:50]
+        return web.json_response({'beatmaps': [self._beatmap_for(beatmap_id) for beatmap_id in beatmap_ids
+                                               if beatmap_id not in self.unknown_beatmaps]})
+
+    async def _user_beatmap_score(self, request: web.Request) -> web.Response:
+        beatmap_id = int(request.match_info['beatmap'])
+        user_id = int(request.match_info['user'])
+        if beatmap_id in self.unknown_beatmaps or str(user_id) in self.unknown_users:
+            return self._not_found()
+
+        score = self._beatmap_user_score['score']
+        score = dict(score, user_id=user_id, beatmap=dict(score['beatmap'], id=beatmap_id),
+                     user=dict(score['user'], id=user_id))
+        return web.json_response(dict(self._beatmap_user_score, score=score))
+
+    async def _rankings_handler(self, request: web.Request) -> web.Response:
+        return web.json_response(self._rankings)
+
+    async def _country_scores_handler(self, request: web.Request) -> web.Response:
+        return web.json_response(self._country_scores)
+
+    async def _beatmap_file_handler(self, request: web.Request) -> web.Response:
+        if int(request.match_info['beatmap']) in self.unknown_beatmaps:
+            return web.Response(status=404)
+        etag = f'"{hashlib.md5(self._beatmap_file).hexdigest()}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(body=self._beatmap_file, content_type='text/plain', headers={'ETag': etag})
@@ -0,0 +1,99 @@
+import time
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from toxic_bot.helpers.cache import TieredCache, TTLCache, pack, unpack
+
+
+class TestTTLCache(TestCase):
+    def test_expired_entry_is_a_miss(self):
+        cache = TTLCache()
+        cache.set('user', 1, ttl=0.01)
+        self.assertEqual(cache.get('user'), 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('user'))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+
+    def test_size_bound(self):
+        cache = TTLCache(max_size=10, sizeof=len)
+        cache.set('a', b'12345')
+        cache.set('b', b'123456')
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.size, 6)
+        cache.set('c', b'x' * 11)
+        self.assertNotIn('c', cache)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.gets = 0
+
+    async def get(self, key):
+        self.gets += 1
+        return self.values.get(key)
+
+    async def set(self, key, value, px=None):
+        self.values[key] = value
+
+
+class TestTieredCache(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.database = SimpleNamespace(binary_c=FakeRedis())
+
+    def test_pack_round_trip(self):
+        value = {'id': 1, 'mods': ['HD'], 'pp': 312.5, 'beatmap': None}
+        self.assertEqual(unpack(pack(value)), value)
+
+    async def test_value_is_shared_between_processes(self):
+        first = TieredCache(self.database, namespace='osu-api')
+        second = TieredCache(self.database, namespace='osu-api')
+        await first.set('beatmaps/1', {'id': 1}, ttl=60)
+        self.assertEqual(await second.get('beatmaps/1'), {'id': 1})
+        self.assertEqual(await second.get('beatmaps/1'), {'id': 1})
+        self.assertEqual(self.database.binary_c.gets, 1)
+        self.assertEqual(second.stats()['redis_hits'], 1)
+
+    async def test_namespaces_are_separate(self):
+        await TieredCache(self.database, namespace='osu-api').set('key', 1, ttl=60)
+        self.assertIsNone(await TieredCache(self.database, namespace='cards').get('key'))
+
+    async def test_expired_value_is_stale(self):
+        await TieredCache(self.database, namespace='osu-api').set('users/2', {'id': 2}, ttl=0)
+        other = TieredCache(self.database, namespace='osu-api')
+        self.assertIsNone(await other.get('users/2'))
+        self.assertEqual(await other.get_stale('users/2'), {'id': 2})
+
+    async def test_lookup_reads_redis_once(self):
+        await TieredCache(self.database, namespace='osu-api').set('users/2', {'id': 2}, ttl=0)
+        other = TieredCache(self.database, namespace='osu-api')
+        gets = self.database.binary_c.gets
+        self.assertEqual(await other.lookup('users/3'), (None, False))
+        self.assertEqual(await other.lookup('users/2'), ({'id': 2}, False))
+        self.assertEqual(self.database.binary_c.gets - gets, 2)
+
+        await other.set('users/2', {'id': 2}, ttl=60)
+        self.assertEqual(await other.lookup('users/2'), ({'id': 2}, True))
+        self.assertEqual(self.database.binary_c.gets - gets, 2)
+
+    async def test_works_without_redis(self):
+        cache = TieredCache(SimpleNamespace(binary_c=None), namespace='cards')
+        calls = []
+
+        async def factory():
+            calls.append(1)
+            return [1, 2]
+
+        self.assertEqual(await cache.get_or_set('key', factory, ttl=60), [1, 2])
+        self.assertEqual(await cache.get_or_set('key', factory, ttl=60), [1, 2])
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,41 @@
+import time
+from unittest import TestCase
+
+from toxic_bot.helpers.circuit_breaker import CircuitBreaker
+
+
+class TestCircuitBreaker(TestCase):
+    def test_opens_after_threshold(self):
+        circuit = CircuitBreaker('beatmaps', failure_threshold=2, reset_timeout=60)
+        circuit.record_failure()
+        self.assertTrue(circuit.allow_request())
+        circuit.record_failure()
+        self.assertEqual(circuit.state, CircuitBreaker.OPEN)
+        self.assertFalse(circuit.allow_request())
+
+    def test_half_open_lets_one_trial_through(self):
+        circuit = CircuitBreaker('users', failure_threshold=1, reset_timeout=0.01)
+        circuit.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(circuit.allow_request())
+        self.assertFalse(circuit.allow_request())
+        circuit.record_success()
+        self.assertEqual(circuit.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_opens_again(self):
+        circuit = CircuitBreaker('users', failure_threshold=3, reset_timeout=0.01)
+        for _ in range(3):
+            circuit.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(circuit.allow_request())
+        circuit.record_failure()
+        self.assertEqual(circuit.state, CircuitBreaker.OPEN)
+
+    def test_released_trial_lets_another_through(self):
+        circuit = CircuitBreaker('users', failure_threshold=1, reset_timeout=0.01)
+        circuit.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(circuit.allow_request())
+        circuit.release_trial()
+        self.assertEqual(circuit.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(circuit.allow_request())
@@ -0,0 +1,55 @@
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from PIL import Image
+
+from toxic_bot.helpers.cover_cache import CoverCache, cover_size
+
+
+class TestCoverCache(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_cover(self, name: str, size=(1600, 560)) -> str:
+        path = os.path.join(self.directory.name, name)
+        Image.new('RGB', size, (200, 100, 50)).save(path, format='JPEG')
+        return path
+
+    async def test_backgrounds_are_prepared_once(self):
+        cache = CoverCache()
+        path = self.write_cover('1.jpg')
+        cover = await cache.get(1, path)
+        self.assertEqual(cover.size, cover_size)
+
+        # Drawing on a returned background doesn't change the cached one
+        cover.paste((255, 255, 255), (0, 0, *cover_size))
+        os.remove(path)
+        self.assertNotEqual((await cache.get(1, path)).getpixel((400, 140)), (255, 255, 255))
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    async def test_changed_cover_is_prepared_again(self):
+        cache = CoverCache()
+        path = self.write_cover('1.jpg')
+        await cache.get(1, path)
+
+        Image.new('RGB', (1600, 560), (50, 100, 200)).save(path, format='JPEG')
+        # Some filesystems only keep whole seconds
+        os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 2 * 10 ** 9))
+        red, _, blue = (await cache.get(1, path)).getpixel((400, 140))
+        self.assertGreater(blue, red)
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    async def test_unreadable_cover(self):
+        path = os.path.join(self.directory.name, 'broken.jpg')
+        with open(path, 'wb') as f:
+            f.write(b'not an image')
+        cover = await CoverCache().get(2, path)
+        self.assertEqual(cover.size, cover_size)
+
+    async def test_memory_is_bounded(self):
+        cache = CoverCache(max_bytes=cover_size[0] * cover_size[1] * 3 * 2)
+        for beatmapset_id in range(3):
+            await cache.get(beatmapset_id, self.write_cover(f'{beatmapset_id}.jpg'))
+        self.assertEqual(cache.stats()['entries'], 2)
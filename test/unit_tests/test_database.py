@@ -0,0 +1,72 @@
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, MagicMock
+
+from toxic_bot.helpers.database import Database
+
+
+class TestDatabase(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.db = Database(None)
+        self.db.c = AsyncMock()
+        self.db._invalidate_prefix()
+
+    async def test_prefix_is_cached(self):
+        self.db.c.get.return_value = '!'
+        self.assertEqual(await self.db.get_prefix(1), '!')
+        self.assertEqual(await self.db.get_prefix(1), '!')
+        self.assertEqual(self.db.c.get.await_count, 1)
+
+    async def test_default_prefix_is_cached(self):
+        self.db.c.get.return_value = None
+        self.assertIsNone(await self.db.get_prefix(1))
+        self.assertIsNone(await self.db.get_prefix(1))
+        self.assertEqual(self.db.c.get.await_count, 1)
+
+    async def test_set_prefix_publishes_invalidation(self):
+        self.db.c.get.return_value = '!'
+        await self.db.get_prefix(1)
+        await self.db.set_prefix(1, '?')
+        self.db.c.publish.assert_awaited_once_with(Database(None).prefix_channel, '1')
+
+        self.db.c.get.return_value = '?'
+        self.assertEqual(await self.db.get_prefix(1), '?')
+
+    async def test_invalidation_drops_cached_prefix(self):
+        self.db.c.get.return_value = '!'
+        await self.db.get_prefix(1)
+        await self.db.get_prefix(2)
+        self.db._invalidate_prefix(1)
+        await self.db.get_prefix(1)
+        await self.db.get_prefix(2)
+        self.assertEqual(self.db.c.get.await_count, 3)
+
+    async def test_get_users_pipelines_lookups(self):
+        self.db.c.pipeline = MagicMock()
+        pipe = self.db.c.pipeline.return_value.__aenter__.return_value
+        pipe.hgetall = MagicMock()
+        pipe.execute = AsyncMock(return_value=[{'osu_id': '2'}, {}])
+        users = await self.db.get_users([10, 20, 10])
+        self.assertEqual(users, {10: {'osu_id': '2'}, 20: None})
+        self.assertEqual(pipe.hgetall.call_count, 2)
+        pipe.execute.assert_awaited_once()
+
+    async def test_get_users_is_chunked(self):
+        self.db.get_users_chunk_size = 2
+        self.addCleanup(delattr, self.db, 'get_users_chunk_size')
+        self.db.c.pipeline = MagicMock()
+        pipe = self.db.c.pipeline.return_value.__aenter__.return_value
+        pipe.hgetall = MagicMock()
+        pipe.execute = AsyncMock(side_effect=[[{'osu_id': '2'}, {}], [{'osu_id': '3'}]])
+        users = await self.db.get_users([10, 20, 30])
+        self.assertEqual(users, {10: {'osu_id': '2'}, 20: None, 30: {'osu_id': '3'}})
+        self.assertEqual(pipe.execute.await_count, 2)
+
+    async def test_operations_are_timed(self):
+        self.db.c.hgetall.return_value = {'osu_id': '2'}
+        await self.db.get_user(10)
+        self.db.c.hgetall.side_effect = TimeoutError
+        with self.assertRaises(TimeoutError):
+            await self.db.get_user(10)
+        stats = self.db.stats()['operations']['get_user']
+        self.assertGreaterEqual(stats['count'], 2)
+        self.assertGreaterEqual(stats['errors'], 1)
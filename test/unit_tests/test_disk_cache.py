@@ -0,0 +1,65 @@
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from toxic_bot.helpers.disk_cache import DiskCache
+
+
+class TestDiskCache(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.root = self.directory.name
+        # DiskCache() returns the process wide instance, tests need their own
+        self.cache_class = type(DiskCache())
+
+    def write(self, relative_path: str, size: int) -> str:
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        return path
+
+    async def test_index_is_rebuilt_from_disk(self):
+        self.write('beatmaps/1/covers/card@2x.jpg', 10)
+        self.write('osu/1', 20)
+        self.write('osu/1.meta', 5)
+        self.write('fonts/Torus Regular.otf', 1000)
+        cache = self.cache_class(root=self.root, max_bytes=100)
+        await cache.initialize()
+        self.assertEqual(cache.stats()['files'], 2)
+        self.assertEqual(cache.size, 30)
+        self.assertTrue(await cache.lookup(os.path.join(self.root, './osu/1')))
+        self.assertFalse(await cache.lookup(os.path.join(self.root, 'osu/2')))
+        self.assertEqual(cache.stats()['hit_rate'], 0.5)
+
+    async def test_least_recently_used_files_are_evicted(self):
+        cache = self.cache_class(root=self.root, max_bytes=30, low_watermark=1)
+        icon = self.write('icons/mods/HD.png', 100)
+        paths = []
+        for i in range(3):
+            paths.append(self.write(f'osu/{i}', 10))
+            await cache.add(paths[-1], 10)
+        await cache.lookup(paths[0])
+        metadata = self.write('osu/1.meta', 5)
+        paths.append(self.write('osu/3', 10))
+        await cache.add(paths[-1], 10)
+
+        self.assertFalse(os.path.exists(paths[1]))
+        self.assertFalse(os.path.exists(metadata))
+        self.assertTrue(all(os.path.exists(path) for path in (paths[0], paths[2], paths[3], icon)))
+        self.assertEqual(cache.size, 30)
+        self.assertEqual(cache.stats()['evicted_bytes'], 10)
+
+    async def test_least_frequently_used_files_are_evicted(self):
+        cache = self.cache_class(root=self.root, max_bytes=20, policy=DiskCache().LFU, low_watermark=1)
+        first, second = self.write('osu/1', 10), self.write('osu/2', 10)
+        await cache.add(first, 10)
+        await cache.add(second, 10)
+        await cache.lookup(first)
+        await cache.lookup(first)
+        await cache.lookup(second)
+        third = self.write('osu/3', 10)
+        await cache.add(third, 10)
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
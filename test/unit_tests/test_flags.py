@@ -0,0 +1,39 @@
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from PIL import Image
+
+from toxic_bot.helpers import flags
+from toxic_bot.helpers.flags import FlagCache, black_to_transparent, flag_url
+
+
+class TestFlagImages(TestCase):
+    def test_black_is_transparent(self):
+        image = Image.new('RGB', (2, 1), (0, 0, 0))
+        image.putpixel((1, 0), (200, 0, 0))
+        flag = black_to_transparent(image)
+        self.assertEqual(flag.mode, 'RGBA')
+        self.assertEqual(flag.getpixel((0, 0)), (0, 0, 0, 0))
+        self.assertEqual(flag.getpixel((1, 0)), (200, 0, 0, 255))
+
+    def test_flag_url(self):
+        self.assertEqual(flag_url('tr'), 'https://osu.ppy.sh/assets/images/flags/1f1f9-1f1f7.svg')
+
+
+class TestFlagCache(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.flags_folder = flags.flags_folder
+        flags.flags_folder = self.directory.name
+        self.addCleanup(setattr, flags, 'flags_folder', self.flags_folder)
+
+    async def test_rasterized_flags_are_read_once(self):
+        Image.new('RGBA', (54, 54), (255, 0, 0, 255)).save(os.path.join(self.directory.name, 'TR.png'))
+        cache = FlagCache()
+        flag = await cache.get('tr')
+        self.assertEqual((flag.mode, flag.size), ('RGBA', (54, 54)))
+        os.remove(os.path.join(self.directory.name, 'TR.png'))
+        self.assertIs(await cache.get('TR'), flag)
+        self.assertEqual(cache.stats(), {'flags': 1, 'rasterized': 0})
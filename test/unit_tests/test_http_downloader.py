@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+import aiohttp
+
+from test.fake_osu_api import FakeOsuApi
+from toxic_bot.helpers import http_downloader
+from toxic_bot.helpers.disk_cache import DiskCache
+from toxic_bot.helpers.http_pool import HttpPool
+
+
+class TestHttpDownloader(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.assets_folder = http_downloader.assets_folder
+        http_downloader.assets_folder = self.directory.name
+        self.osu_url = http_downloader.osu_url
+
+        self.fake = FakeOsuApi(latency=0.05)
+        await self.fake.start()
+        http_downloader.osu_url = self.fake.url
+
+    async def asyncTearDown(self):
+        http_downloader.assets_folder = self.assets_folder
+        http_downloader.osu_url = self.osu_url
+        await HttpPool().close()
+        await self.fake.close()
+
+    async def test_concurrent_downloads_are_shared(self):
+        url = f'{self.fake.url}/osu/129891'
+        paths = await asyncio.gather(*[http_downloader.download_and_save_asset(url) for _ in range(5)])
+        self.assertEqual(len(set(paths)), 1)
+        self.assertEqual(self.fake.requests['beatmap_file'], 1)
+
+        with open(paths[0], 'rb') as f:
+            self.assertTrue(f.read().startswith(b'osu file format'))
+        self.assertEqual(os.listdir(os.path.dirname(paths[0])), ['129891'])
+
+        await http_downloader.download_and_save_asset(url)
+        self.assertEqual(self.fake.requests['beatmap_file'], 1)
+
+    async def test_beatmaps_are_stored_by_checksum(self):
+        checksum = hashlib.md5(self.fake._beatmap_file).hexdigest()
+        path = await http_downloader.download_and_save_beatmap(129891, checksum)
+        self.assertEqual(os.path.basename(path), f'{checksum}.osu')
+        await http_downloader.download_and_save_beatmap(129891, checksum)
+        self.assertEqual(self.fake.requests['beatmap_file'], 1)
+
+        # An identical file of another beatmap is stored once
+        self.assertEqual(await http_downloader.download_and_save_beatmap(129892, checksum), path)
+
+        # An updated beatmap is downloaded again, and stored by what was downloaded
+        updated_path = await http_downloader.download_and_save_beatmap(129891, 'updated')
+        self.assertEqual(self.fake.requests['beatmap_file'], 2)
+        self.assertEqual(updated_path, path)
+
+    async def test_mismatched_checksum_is_downloaded_once(self):
+        paths = [await http_downloader.download_and_save_beatmap(129891, 'mismatched') for _ in range(3)]
+        self.assertEqual(self.fake.requests['beatmap_file'], 1)
+        self.assertEqual(len(set(paths)), 1)
+        self.assertEqual(os.path.basename(paths[0]), f'{hashlib.md5(self.fake._beatmap_file).hexdigest()}.osu')
+
+    async def test_expired_assets_are_revalidated(self):
+        url = f'{self.fake.url}/osu/129891'
+        path = await http_downloader.download_and_save_asset(url, max_age=60)
+        await http_downloader.download_and_save_asset(url, max_age=60)
+        self.assertEqual(self.fake.requests['beatmap_file'], 1)
+
+        # Unchanged, the server answers without the file
+        self.assertEqual(await http_downloader.download_and_save_asset(url, max_age=0), path)
+        self.assertEqual(self.fake.responses[304], 1)
+
+        self.fake._beatmap_file = b'osu file format v14 updated'
+        await http_downloader.download_and_save_asset(url, max_age=0)
+        self.assertEqual(self.fake.requests['beatmap_file'], 3)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'osu file format v14 updated')
+
+    async def test_failed_revalidation_backs_off(self):
+        url = f'{self.fake.url}/osu/129891'
+        path = await http_downloader.download_and_save_asset(url, max_age=0)
+
+        self.fake.error_rate = 1
+        self.assertEqual(await http_downloader.download_and_save_asset(url, max_age=0), path)
+        self.assertEqual(await http_downloader.download_and_save_asset(url, max_age=0), path)
+        self.assertEqual(self.fake.requests['beatmap_file'], 2)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), self.fake._beatmap_file)
+
+    async def test_failed_download_leaves_nothing_behind(self):
+        self.fake.unknown_beatmaps.add(404)
+        # An unknown beatmap is answered with 404, every request with 500 when error_rate is 1
+        for beatmap_id, error_rate in ((404, 0), (500, 1)):
+            self.fake.error_rate = error_rate
+            url = f'{self.fake.url}/osu/{beatmap_id}'
+            with self.assertRaises(aiohttp.ClientResponseError):
+                await http_downloader.download_and_save_asset(url, max_age=60)
+
+            path = os.path.join(self.directory.name, '.osu', str(beatmap_id))
+            self.assertFalse(os.path.exists(path))
+            self.assertFalse(os.path.exists(path + http_downloader.METADATA_SUFFIX))
+            self.assertFalse(await DiskCache().lookup(path))
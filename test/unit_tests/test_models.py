@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from toxic_bot.helpers.models import ApiObject, Beatmap, BeatmapUserScore, Score
+
+
+class TestModels(TestCase):
+    def setUp(self):
+        self.data = {'id': 1, 'accuracy': 0.98, 'mods': ['HD'],
+                     'beatmap': {'id': 2, 'version': 'Insane'},
+                     'beatmapset': {'id': 3, 'covers': {'card@2x': 'https://assets.ppy.sh/card@2x.jpg'}}}
+
+    def test_nested_objects_are_wrapped_on_access(self):
+        score = Score(self.data)
+        self.assertIsInstance(score.beatmap, Beatmap)
+        self.assertIs(score.beatmap, score.beatmap)
+        self.assertIsInstance(score.beatmapset.covers, ApiObject)
+        self.assertEqual(getattr(score.beatmapset.covers, 'card@2x'), 'https://assets.ppy.sh/card@2x.jpg')
+        self.assertEqual(score.mods, ['HD'])
+
+    def test_missing_field_raises_attribute_error(self):
+        score = Score(self.data)
+        self.assertFalse(hasattr(score, 'user'))
+        self.assertFalse(hasattr(score, 'pp'))
+
+    def test_assignments_do_not_change_decoded_data(self):
+        score = Score(self.data)
+        score.accuracy *= 100
+        score.beatmap.max_combo = 500
+        self.assertEqual(score.accuracy, 98)
+        self.assertEqual(score.beatmap.max_combo, 500)
+        self.assertEqual(self.data['accuracy'], 0.98)
+        self.assertNotIn('max_combo', self.data['beatmap'])
+        self.assertEqual(Score(self.data).accuracy, 0.98)
+
+    def test_beatmap_user_score(self):
+        user_score = BeatmapUserScore({'position': 5, 'score': self.data})
+        self.assertIsInstance(user_score.score, Score)
+        self.assertEqual(user_score.score.beatmap.version, 'Insane')
+
+    def test_nested_objects_of_stale_object_are_stale(self):
+        user_score = BeatmapUserScore({'position': 5, 'score': self.data}, stale=True)
+        self.assertTrue(user_score.score.is_stale)
+        self.assertTrue(user_score.score.beatmapset.covers.is_stale)
+        self.assertFalse(Score(self.data).beatmap.is_stale)
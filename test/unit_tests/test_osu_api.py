@@ -1,5 +1,137 @@
+import asyncio
+from contextlib import aclosing
+from types import SimpleNamespace
 from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock
+
+from test.fake_osu_api import FakeOsuApi
+from toxic_bot.helpers.circuit_breaker import CircuitBreaker
+from toxic_bot.helpers.http_pool import HttpPool
+from toxic_bot.helpers.models import Beatmap, User
+from toxic_bot.helpers.osu_api import OsuApiV2
+from toxic_bot.helpers.rate_limiter import RateLimiter
+from toxic_bot.helpers.username_index import UsernameIndex
+
 
 class TestOsuApi(IsolatedAsyncioTestCase):
-    def test_osu_api_(self):
-        pass
\ No newline at end of file
+    async def asyncSetUp(self):
+        self.fake = FakeOsuApi(seed=0)
+        await self.fake.start()
+        self.api = OsuApiV2('client-id', 'client-secret', 'session-key', requests_per_second=1000, burst=100,
+                            osu_url=self.fake.url, username_index=UsernameIndex(SimpleNamespace(c=None)))
+        self.api.retry_base_delay = 0.01
+        self.api.retry_max_delay = 0.05
+
+    async def asyncTearDown(self):
+        await self.api.close()
+        await HttpPool().close()
+        await self.fake.close()
+
+    async def test_get_user_is_cached(self):
+        user = await self.api.get_user(2)
+        self.assertIsInstance(user, User)
+        self.assertEqual(user.id, 2)
+        await self.api.get_user(2)
+        self.assertEqual(self.fake.requests['user'], 1)
+        self.assertEqual(self.fake.requests['token'], 1)
+
+    async def test_concurrent_requests_are_coalesced(self):
+        self.fake.latency = 0.05
+        beatmaps = await asyncio.gather(*[self.api.get_beatmap(129891) for _ in range(10)])
+        self.assertTrue(all(isinstance(beatmap, Beatmap) for beatmap in beatmaps))
+        self.assertEqual(self.fake.requests['beatmap'], 1)
+
+    async def test_not_found_is_cached(self):
+        self.fake.unknown_users.add('404')
+        self.assertIsNone(await self.api.get_user(404))
+        self.assertIsNone(await self.api.get_user(404))
+        self.assertEqual(self.fake.requests['user'], 1)
+        self.assertEqual(self.api.stats()['not_found_hits'], 1)
+
+    async def test_missing_beatmaps_of_batch_are_cached(self):
+        self.fake.unknown_beatmaps.add(3)
+        beatmaps = await self.api.get_beatmaps([1, 2, 3])
+        self.assertEqual(sorted(beatmaps), [1, 2])
+        self.assertIsNone(await self.api.get_beatmap(3))
+        self.assertEqual(self.fake.requests['beatmap'], 0)
+
+    async def test_rate_limited_request_is_retried(self):
+        self.fake.rate_limit = 2
+        self.fake.rate_limit_window = 0.2
+        self.fake.retry_after = 0.2
+        self.api.retry_max_delay = 0.5
+        users = await asyncio.gather(self.api.get_user(1), self.api.get_user(2), self.api.get_user(3))
+        self.assertEqual([user.id for user in users], [1, 2, 3])
+        self.assertGreater(self.fake.responses[429], 0)
+
+    async def test_revoked_token_is_refreshed(self):
+        await self.api.get_user(1)
+        self.fake.revoke_token()
+        user = await self.api.get_user(2)
+        self.assertEqual(user.id, 2)
+        self.assertEqual(self.fake.requests['token'], 2)
+
+    async def test_get_beatmaps_batches_requests(self):
+        beatmaps = await self.api.get_beatmaps(range(1, 61))
+        self.assertEqual(sorted(beatmaps), list(range(1, 61)))
+        self.assertEqual(self.fake.requests['beatmaps'], 2)
+
+    async def test_iter_user_scores_stops_at_last_page(self):
+        self.fake.score_count = 70
+        scores = [score async for score in self.api.iter_user_scores(2, 'best', max_results=100, page_size=50)]
+        self.assertEqual(len(scores), 70)
+        self.assertEqual(len({score.id for score in scores}), 70)
+
+    async def test_iter_user_scores_cancels_pages_when_stopped(self):
+        self.api.rate_limiter = RateLimiter(rate=10, burst=2)
+        async with aclosing(self.api.iter_user_scores(2, 'best', max_results=200, page_size=10)) as scores:
+            async for _ in scores:
+                break
+        await asyncio.sleep(0.5)
+        # Only the pages sent before the consumer stopped reached osu!
+        self.assertLessEqual(self.fake.requests['user_scores'], 3)
+
+    async def test_stale_response_when_api_fails(self):
+        self.api.cache_ttls['user'] = 0
+        await self.api.get_user(2)
+        self.fake.error_rate = 1
+        self.assertEqual(self.api.stats()['stale_responses'], 0)
+        user = await self.api.get_user(2)
+        self.assertTrue(user.is_stale)
+        self.assertEqual(user.id, 2)
+        self.assertEqual(self.api.stats()['stale_responses'], 1)
+
+    async def test_cold_miss_is_not_a_stale_hit(self):
+        await self.api.get_user(2)
+        stats = self.api.stats()
+        self.assertEqual(stats['stale_responses'], 0)
+        self.assertEqual(stats['cache']['stale_hits'], 0)
+        self.assertEqual(stats['cache']['misses'], 1)
+
+    async def test_unexpected_error_ends_circuit_trial(self):
+        circuit = self.api._circuit('users')
+        circuit.reset_timeout = 0.2
+        for _ in range(circuit.failure_threshold):
+            circuit.record_failure()
+        await asyncio.sleep(0.25)
+
+        send_request = self.api._send_request
+        self.api._send_request = AsyncMock(side_effect=KeyError('access_token'))
+        with self.assertRaises(KeyError):
+            await self.api.get_user(2)
+        self.assertEqual(circuit.state, CircuitBreaker.OPEN)
+
+        # The failed trial doesn't keep the circuit from trying again
+        self.api._send_request = send_request
+        await asyncio.sleep(0.25)
+        self.assertEqual((await self.api.get_user(2)).id, 2)
+        self.assertEqual(circuit.state, CircuitBreaker.CLOSED)
+
+    async def test_usernames_are_indexed(self):
+        user = await self.api.get_user_by_name('heyronii')
+        self.assertEqual(await self.api.get_user_id('HeyRonii'), user.id)
+        self.assertEqual(self.fake.requests['user'], 1)
+
+        await self.api.get_user_scores(2, 'best')
+        self.assertEqual(await self.api.get_user_id('heyronii'), 2)
+        self.assertEqual(self.fake.requests['user'], 1)
@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from toxic_bot.helpers import prefetcher
+from toxic_bot.helpers.prefetcher import AssetPrefetcher
+
+
+def make_score(beatmap_id: int) -> SimpleNamespace:
+    covers = SimpleNamespace(**{'card@2x': f'https://assets.ppy.sh/beatmaps/{beatmap_id}/covers/card@2x.jpg'})
+    return SimpleNamespace(beatmap=SimpleNamespace(id=beatmap_id, checksum=f'{beatmap_id:032x}'),
+                           beatmapset=SimpleNamespace(covers=covers))
+
+
+class TestAssetPrefetcher(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.downloaded = []
+        self.running = 0
+        self.max_running = 0
+        self.delay = 0.01
+        for name in ('download_and_save_beatmap', 'download_and_save_asset'):
+            patcher = patch.object(prefetcher, name, self.download)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(AssetPrefetcher, '_file_size', staticmethod(lambda path: 100))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def download(self, key, *args):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        self.downloaded.append(key)
+        return str(key)
+
+    async def test_assets_of_other_scores_are_downloaded(self):
+        scores = [make_score(beatmap_id) for beatmap_id in (1, 2, 3, 2)]
+        await AssetPrefetcher(max_concurrency=2).prefetch('channel', scores, index=0)
+        # The shown score is skipped and the repeated beatmap is downloaded once
+        self.assertCountEqual([key for key in self.downloaded if isinstance(key, int)], [2, 3])
+        self.assertEqual(len(self.downloaded), 4)
+        self.assertEqual(self.max_running, 2)
+
+    async def test_byte_budget_stops_a_run(self):
+        scores = [make_score(beatmap_id) for beatmap_id in range(20)]
+        assets = AssetPrefetcher(max_concurrency=1, max_bytes=300)
+        await assets.prefetch('channel', scores, index=5)
+        self.assertEqual(len(self.downloaded), 3)
+        # Closest to the shown score first
+        self.assertEqual(self.downloaded[0], 4)
+
+    async def test_new_run_cancels_the_previous_one(self):
+        self.delay = 0.05
+        scores = [make_score(beatmap_id) for beatmap_id in range(10)]
+        assets = AssetPrefetcher(max_concurrency=1)
+        first = assets.prefetch('channel', scores, index=0)
+        await asyncio.sleep(0)
+        second = assets.prefetch('channel', scores[:2], index=0)
+        await second
+        self.assertTrue(first.cancelled())
+        self.assertEqual(assets.stats()['cancelled'], 1)
+        self.assertEqual(assets.stats()['running'], 0)
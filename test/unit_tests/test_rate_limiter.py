@@ -0,0 +1,42 @@
+import asyncio
+import time
+from unittest import IsolatedAsyncioTestCase
+
+from toxic_bot.helpers.rate_limiter import Priority, RateLimiter
+
+
+class TestRateLimiter(IsolatedAsyncioTestCase):
+    async def test_burst_is_not_delayed(self):
+        limiter = RateLimiter(rate=1, burst=3)
+        start = time.monotonic()
+        for _ in range(3):
+            await limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    async def test_interactive_lane_served_first(self):
+        limiter = RateLimiter(rate=50, burst=1)
+        await limiter.acquire()
+        order = []
+
+        async def request(name, priority):
+            await limiter.acquire(priority)
+            order.append(name)
+
+        background = [asyncio.create_task(request(f'bg{i}', Priority.BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(request('rs', Priority.INTERACTIVE))
+        await asyncio.gather(interactive, *background)
+
+        self.assertEqual(order[0], 'rs')
+        self.assertEqual(order[1:], ['bg0', 'bg1', 'bg2'])
+
+    async def test_cancelled_waiter_does_not_block_queue(self):
+        limiter = RateLimiter(rate=50, burst=1)
+        await limiter.acquire()
+        cancelled = asyncio.create_task(limiter.acquire())
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.wait_for(waiting, timeout=1)
+
+        self.assertEqual(limiter.stats()['queue_depth']['interactive'], 0)
@@ -0,0 +1,37 @@
+import os
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+
+from toxic_bot.helpers.render_cache import RenderCache
+
+
+class TestRenderCache(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    async def test_memory_only(self):
+        cache = RenderCache(max_memory_bytes=10)
+        await cache.set('a', b'12345')
+        await cache.set('b', b'123456')
+        self.assertIsNone(await cache.get('a'))
+        self.assertEqual(await cache.get('b'), b'123456')
+
+    async def test_render_survives_restart(self):
+        await RenderCache(directory=self.directory.name).set('score:osu:1:abc:v1', b'png')
+        cache = RenderCache(directory=self.directory.name)
+        self.assertEqual(await cache.get('score:osu:1:abc:v1'), b'png')
+        self.assertIsNone(await cache.get('score:osu:2:abc:v1'))
+        self.assertEqual(cache.stats()['disk_hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    async def test_disk_is_size_bounded(self):
+        cache = RenderCache(max_memory_bytes=0, directory=self.directory.name, max_disk_bytes=10)
+        await cache.set('a', b'1234')
+        await cache.set('b', b'1234')
+        await cache.get('a')
+        await cache.set('c', b'1234')
+        self.assertEqual(await cache.get('a'), b'1234')
+        self.assertIsNone(await cache.get('b'))
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+        self.assertEqual(cache.disk_size, 8)
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Dict, Iterable, Optional
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock
+
+from nextcord.ext.commands import CommandError
+
+from test.fake_osu_api import FakeOsuApi
+from toxic_bot.cogs.score_interactions import ScoreInteractions
+from toxic_bot.helpers.http_pool import HttpPool
+from toxic_bot.helpers.models import Score
+from toxic_bot.helpers.osu_api import OsuApiV2
+from toxic_bot.helpers.rate_limiter import RateLimiter
+
+
+class FakeDatabase:
+    def __init__(self, linked_users: Dict[int, int]):
+        """
+        :param linked_users: Discord id -> osu! id of the linked members.
+        """
+        self.linked_users = linked_users
+
+    async def get_users(self, discord_ids: Iterable[int]) -> Dict[int, Optional[dict]]:
+        return {discord_id: {'osu_id': str(self.linked_users[discord_id])} if discord_id in self.linked_users else None
+                for discord_id in discord_ids}
+
+
+class TestScoreInteractions(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fake = FakeOsuApi(seed=0, unknown_users=['106'])
+        await self.fake.start()
+        self.api = OsuApiV2('client-id', 'client-secret', 'session-key', requests_per_second=1000, burst=100,
+                            osu_url=self.fake.url)
+        self.db = FakeDatabase({discord_id: 100 + discord_id for discord_id in range(7)})
+        self.cog = ScoreInteractions(SimpleNamespace(api=self.api, db=self.db))
+        self.cog.guild_leaderboard_update_interval = 0
+
+        self.message = SimpleNamespace(edit=AsyncMock())
+        members = [SimpleNamespace(id=discord_id, bot=False) for discord_id in range(10)]
+        members.append(SimpleNamespace(id=100, bot=True))
+        self.interaction = SimpleNamespace(guild=SimpleNamespace(name='toxic', members=members),
+                                           response=SimpleNamespace(defer=AsyncMock()),
+                                           send=AsyncMock(return_value=self.message))
+
+    async def asyncTearDown(self):
+        await self.api.close()
+        await HttpPool().close()
+        await self.fake.close()
+
+    async def test_guild_leaderboard_command(self):
+        await self.cog.guild_leaderboard_interaction.callback(self.cog, self.interaction, beatmap_id=129891)
+
+        self.interaction.response.defer.assert_awaited_once()
+        self.interaction.send.assert_awaited_once()
+        # One score request per linked member, the unlinked members and the bot aren't looked up
+        self.assertEqual(self.fake.requests['user_beatmap_score'], 7)
+
+        embeds = self.message.edit.await_args.kwargs['view'].embeds
+        self.assertEqual(len(embeds), 2)
+        self.assertEqual(embeds[-1].footer.text, 'Checked 7 linked members')
+        self.assertEqual(sum(embed.description.count('Rank**') for embed in embeds), 6)
+
+    async def test_guild_leaderboard_without_linked_members(self):
+        self.db.linked_users = {}
+        with self.assertRaises(CommandError):
+            await self.cog.guild_leaderboard_core(self.interaction, 129891)
+        self.interaction.send.assert_not_awaited()
+
+    async def test_guild_leaderboard_outside_guild(self):
+        self.interaction.guild = None
+        with self.assertRaises(CommandError):
+            await self.cog.guild_leaderboard_core(self.interaction, 129891)
+
+    async def test_guild_scores_stop_when_consumer_stops(self):
+        self.api.rate_limiter = RateLimiter(rate=10, burst=2)
+        scores = self.cog.get_guild_beatmap_scores(list(range(200, 240)), 129891)
+        await scores.__anext__()
+        await scores.aclose()
+        await asyncio.sleep(0.5)
+        # Only the requests sent before the consumer stopped reached osu!
+        self.assertLessEqual(self.fake.requests['user_beatmap_score'], self.cog.guild_leaderboard_concurrency)
+
+    async def test_attach_beatmapsets_batches_lookups(self):
+        plays = [Score({'id': i, 'beatmap': {'id': 1000 + i}}) for i in range(3)]
+        plays.append(Score({'id': 3, 'beatmap': {'id': 1003}, 'beatmapset': {'id': 1}}))
+
+        await self.cog._attach_beatmapsets(plays)
+
+        # One batched request for the plays without a beatmapset
+        self.assertEqual(self.fake.requests['beatmaps'], 1)
+        self.assertEqual(self.fake.requests['beatmap'], 0)
+        self.assertEqual([play.beatmapset.id for play in plays[:3]], [self.fake._beatmap['beatmapset']['id']] * 3)
+        self.assertEqual(plays[3].beatmapset.id, 1)
@@ -0,0 +1,69 @@
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from toxic_bot.helpers.single_flight import SingleFlight
+
+
+class TestSingleFlight(IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_are_shared(self):
+        single_flight = SingleFlight()
+        calls = 0
+
+        async def get_beatmap():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {'id': 1}
+
+        results = await asyncio.gather(*[single_flight.do('beatmaps/1', get_beatmap) for _ in range(5)])
+
+        self.assertEqual(calls, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(len(single_flight), 0)
+
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        single_flight = SingleFlight()
+
+        async def get_beatmap():
+            await asyncio.sleep(0.01)
+            return {'id': 1}
+
+        first = asyncio.create_task(single_flight.do('beatmaps/1', get_beatmap))
+        second = asyncio.create_task(single_flight.do('beatmaps/1', get_beatmap))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        self.assertEqual(await second, {'id': 1})
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+
+    async def test_call_is_cancelled_with_its_last_waiter(self):
+        single_flight = SingleFlight()
+        finished = []
+
+        async def get_beatmap():
+            await asyncio.sleep(0.01)
+            finished.append(1)
+
+        waiters = [asyncio.create_task(single_flight.do('beatmaps/1', get_beatmap)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.sleep(0.02)
+        self.assertEqual(finished, [])
+        self.assertEqual(single_flight.cancelled, 1)
+        self.assertEqual(len(single_flight), 0)
+
+    async def test_kept_running_call_outlives_its_waiters(self):
+        single_flight = SingleFlight()
+        finished = []
+
+        async def get_beatmap():
+            await asyncio.sleep(0.01)
+            finished.append(1)
+
+        waiter = asyncio.create_task(single_flight.do('beatmaps/1', get_beatmap, keep_running=True))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.02)
+        self.assertEqual(finished, [1])
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import AsyncMock, MagicMock
+
+from toxic_bot.helpers.username_index import UsernameIndex
+
+
+class TestUsernameIndex(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.redis.pipeline = MagicMock()
+        self.pipe = self.redis.pipeline.return_value.__aenter__.return_value
+        self.pipe.set = MagicMock()
+        self.pipe.execute = AsyncMock()
+        self.index = UsernameIndex(SimpleNamespace(c=self.redis))
+
+    async def test_lookup_is_case_insensitive(self):
+        await self.index.update({'HeyRonii': 5642779})
+        self.assertEqual(await self.index.get('heyronii'), 5642779)
+        self.pipe.set.assert_called_once_with('username:heyronii', 5642779, ex=int(self.index.ttl))
+        self.redis.get.assert_not_awaited()
+
+    async def test_unchanged_names_are_not_written_again(self):
+        await self.index.update({'heyronii': 5642779})
+        await self.index.update({'HEYRONII': 5642779, 'Toy': 2})
+        self.assertEqual(self.pipe.execute.await_count, 2)
+        self.assertEqual(self.pipe.set.call_count, 2)
+
+    async def test_redis_lookup(self):
+        self.redis.get.return_value = '2'
+        self.assertEqual(await self.index.get('Toy'), 2)
+        self.assertEqual(await self.index.get('toy'), 2)
+        self.redis.get.assert_awaited_once_with('username:toy')
+
+    async def test_redis_errors_are_ignored(self):
+        self.redis.get.side_effect = ConnectionError
+        self.assertIsNone(await self.index.get('toy'))
+        self.assertEqual(self.index.errors, 1)
@@ -1,16 +1,26 @@
+import asyncio
 import logging
 import os
 from abc import ABC
-from typing import Union
+from typing import Optional, Union
 
 from nextcord import Interaction
 from nextcord.ext import commands
 from nextcord.ext.commands import Context
 
+from toxic_bot.helpers.cache import TieredCache
+from toxic_bot.helpers.cover_cache import CoverCache
 from toxic_bot.helpers.crypto import generate_encryption_key
 from toxic_bot.helpers.database import Database
+from toxic_bot.helpers.disk_cache import DiskCache
+from toxic_bot.helpers.flags import FlagCache
+from toxic_bot.helpers.http_pool import HttpPool
+from toxic_bot.helpers.models import dumps
 from toxic_bot.helpers.osu_api import OsuApiV2
 from toxic_bot.helpers.parser import ParserExceptionNoUserFound
+from toxic_bot.helpers.prefetcher import AssetPrefetcher
+from toxic_bot.helpers.render_cache import RenderCache
+from toxic_bot.helpers.username_index import UsernameIndex
 
 logger = logging.getLogger('toxic-bot')
 
@@ -22,22 +32,71 @@ class DiscordOsuBot(commands.Bot, ABC):
                  osu_client_secret: str,
                  osu_redirect_uri: str,
                  osu_session_key: str,
+                 osu_api_rate: float = 1,
+                 osu_api_burst: int = 1,
+                 redis_max_connections: int = 50,
+                 redis_timeout: float = 2,
+                 asset_cache_size: int = 2048,
+                 asset_cache_policy: str = 'lru',
+                 stats_log_interval: float = 15 * 60,
                  *args, **kwargs):
         super().__init__(command_prefix=self.get_prefix, *args, **kwargs)
-        self.db: Database = Database(os.getenv("REDIS_URL"))
+        self.db: Database = Database(os.getenv("REDIS_URL"), max_connections=redis_max_connections,
+                                     socket_timeout=redis_timeout, socket_connect_timeout=redis_timeout)
         self.default_prefix = default_prefix
         self.osu_client_id = osu_client_id
         self.osu_client_secret = osu_client_secret
         self.osu_redirect_uri = osu_redirect_uri
-        self.api = OsuApiV2(osu_client_id, osu_client_secret, osu_session_key)
+        self.http_pool: HttpPool = HttpPool()
+        # Downloaded assets are evicted beyond this budget, the bundled fonts and icons are left alone
+        self.disk_cache: DiskCache = DiskCache(max_bytes=asset_cache_size * 1024 * 1024, policy=asset_cache_policy)
+        # Shared with the other bot processes through Redis once the database is initialized
+        self.card_cache = TieredCache(self.db, namespace='cards', max_entries=1024, max_bytes=16 * 1024 * 1024)
+        self.render_cache = RenderCache(directory=os.path.join('assets', '.renders'))
+        self.cover_cache = CoverCache()
+        self.flag_cache = FlagCache()
+        self.prefetcher = AssetPrefetcher()
+        self.api = OsuApiV2(osu_client_id, osu_client_secret, osu_session_key,
+                            requests_per_second=osu_api_rate, burst=osu_api_burst,
+                            cache=TieredCache(self.db, namespace='osu-api'), http_pool=self.http_pool,
+                            username_index=UsernameIndex(self.db))
+
+        # Seconds between two logs of the bot's stats, they aren't logged if 0
+        self.stats_log_interval = stats_log_interval
+        self._stats_logger: Optional[asyncio.Task] = None
 
         # Generate encryption key for web server communication
         self.encryption_key = None
 
     async def close(self) -> None:
+        if self._stats_logger is not None:
+            self._stats_logger.cancel()
         await super().close()
+        await self.prefetcher.close()
         await self.db.close()
         await self.api.close()
+        await self.http_pool.close()
+
+    def stats(self) -> dict:
+        """Returns the figures of the osu!api wrapper, the HTTP connection pool and the database."""
+        return {'osu_api': self.api.stats(),
+                'http_pool': self.http_pool.stats(),
+                'disk_cache': self.disk_cache.stats(),
+                'database': self.db.stats(),
+                'card_cache': self.card_cache.stats(),
+                'render_cache': self.render_cache.stats(),
+                'cover_cache': self.cover_cache.stats(),
+                'flag_cache': self.flag_cache.stats(),
+                'prefetcher': self.prefetcher.stats()}
+
+    async def _log_stats(self):
+        """Logs the stats of the bot as one JSON line every `stats_log_interval` seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(self.stats_log_interval)
+            try:
+                logger.info(f'Stats: {dumps(self.stats()).decode()}')
+            except Exception as e:
+                logger.warning(f'Could not log stats: {e!r}')
 
     async def on_message(self, message):
         await self.wait_until_ready()
@@ -62,16 +121,21 @@ class DiscordOsuBot(commands.Bot, ABC):
     async def on_ready(self):
         logger.info(f'Logged in as: {self.user.name} - {self.user.id}')
         await self.db.initialize()
+        await self.disk_cache.initialize()
         self.encryption_key = generate_encryption_key()
         await self.db.set_encrypt_key(self.encryption_key)
+        # on_ready runs again after reconnecting, the stats are still logged once per interval
+        if self.stats_log_interval and (self._stats_logger is None or self._stats_logger.done()):
+            self._stats_logger = asyncio.create_task(self._log_stats())
 
     async def get_user_id(self, interaction: Interaction, name: str):
 
         user_details = await self.get_user_from_db(interaction, name)
 
         if user_details is None:
-            user_from_api = await self.api.get_user(name, key='username')
-            user_id = user_from_api.id
+            user_id = await self.api.get_user_id(name)
+            if user_id is None:
+                raise ParserExceptionNoUserFound(f'User `{name}` was not found on osu!')
         else:
             user_id = user_details['osu_id']
 
@@ -97,12 +161,14 @@ class DiscordOsuBot(commands.Bot, ABC):
 
     async def _get_user_db(self, interaction, user_discord_id):
 
-        server_prefix = await self.db.get_prefix(interaction.guild.id)
-        if server_prefix is None:
-            server_prefix = self.default_prefix
-
         user_details = await self.db.get_user(user_discord_id)
         if user_details is None:
+            # The prefix is only needed for the error message
+            server_prefix = None
+            if interaction.guild is not None:
+                server_prefix = await self.db.get_prefix(interaction.guild.id)
+            if server_prefix is None:
+                server_prefix = self.default_prefix
             raise ParserExceptionNoUserFound(
                 f'User <@{user_discord_id}> was not found. '
                 f'If this is you, please link your osu! profile with `{server_prefix}link` or /link')
@@ -1,18 +1,21 @@
 from abc import ABC
-from types import SimpleNamespace
+from typing import Optional
 
 import nextcord
 import rosu_pp_py as rosu
 from ossapi import Mod
 
+from toxic_bot.helpers.cache import TieredCache
 from toxic_bot.helpers.http_downloader import download_and_save_beatmap
+from toxic_bot.helpers.models import Beatmap
 
 
 class MapCard:
-    def __init__(self, beatmap: SimpleNamespace, mods: Mod = Mod.NM):
+    def __init__(self, beatmap: Beatmap, mods: Mod = Mod.NM, cache: Optional[TieredCache] = None):
         self.beatmap = beatmap
         self.beatmapset = beatmap.beatmapset
         self.mods = mods
+        self.cache = cache
 
     async def to_embed(self):
         """
@@ -24,21 +27,14 @@ class MapCard:
 
 
 class EmbedMapCard(MapCard, ABC):
+    # Seconds calculated attributes are cached for
+    attributes_ttl = 7 * 24 * 60 * 60
+
     async def to_embed(self):
         """
         Generates an embed object for the beatmap information.
         """
-        beatmap_path = await download_and_save_beatmap(self.beatmap.id)
-        beatmap = rosu.Beatmap(path=beatmap_path)
-        calc = rosu.Calculator(mods=self.mods.value)
-        map_attributes = calc.map_attributes(beatmap)
-        diff_attributes = calc.difficulty(beatmap)
-        rosu_pp_results = []
-        for acc in [100, 99, 97, 95]:
-            calc.set_acc(acc)
-            perf = calc.performance(beatmap)
-            rosu_pp_results.append(perf)
-        rosu_pp_result = rosu_pp_results[0]
+        attributes = await self.get_attributes()
         beatconnect_link = f"https://beatconnect.io/b/{self.beatmapset.id}/"
         bancho_link = f"https://osu.ppy.sh/beatmapsets/{self.beatmapset.id}/download"
         bloodcat_link = f"https://bloodcat.com/osu/s/{self.beatmapset.id}"
@@ -58,16 +54,16 @@ class EmbedMapCard(MapCard, ABC):
         bmap_mins = self.beatmap.total_length // 60
         bmap_secs = self.beatmap.total_length % 60
 
-        diff_details_text = f"**▸CS:** {map_attributes.cs:.1f} **▸AR:** {diff_attributes.ar:.1f} **▸OD:**" \
-                            f" {diff_attributes.od:.1f} **▸HP:** {map_attributes.hp:.1f}"
+        diff_details_text = f"**▸CS:** {attributes['cs']:.1f} **▸AR:** {attributes['ar']:.1f} **▸OD:**" \
+                            f" {attributes['od']:.1f} **▸HP:** {attributes['hp']:.1f}"
         desc_text = f"<:total_length:680709852988833802> **{bmap_mins}:{bmap_secs:02d}**" \
-                    f" <:bpm:680709843060916292> **{map_attributes.bpm:.0f} bpm**" \
-                    f"  <:count_circles:680712754273058817> **{map_attributes.n_circles}** " \
-                    f" <:count_sliders:680712747012325409> **{map_attributes.n_sliders}**\n" \
+                    f" <:bpm:680709843060916292> **{attributes['bpm']:.0f} bpm**" \
+                    f"  <:count_circles:680712754273058817> **{attributes['n_circles']}** " \
+                    f" <:count_sliders:680712747012325409> **{attributes['n_sliders']}**\n" \
                     f"{diff_details_text} \n" \
                     f"{download_text}\n"
 
-        pp_values = [result.pp for result in rosu_pp_results]
+        pp_values = attributes['pp_values']
         pp_values_text = f'```Acc |{"95%":^8}|{"97%":^8}|{"99%":^8}|{"100%":^8}|\n' \
                          f'----|' + '-' * 8 + '|' + '-' * 8 + '|' + '-' * 8 + '|' + '-' * 8 + '|' + '\n' \
                          f' PP |{pp_values[3]:^8.2f}|{pp_values[2]:^8.2f}|{pp_values[1]:^8.2f}|{pp_values[0]:^8.2f}|```'
@@ -75,17 +71,46 @@ class EmbedMapCard(MapCard, ABC):
         embed = nextcord.Embed()
         embed.set_author(name=f"{self.beatmapset.artist} - {self.beatmapset.title} by {self.beatmapset.creator}",
                          url=self.beatmap.url)
-        embed.add_field(name=f"**[{self.beatmap.version}]** {diff_attributes.stars:.2f}★", value=desc_text, inline=False)
+        embed.add_field(name=f"**[{self.beatmap.version}]** {attributes['stars']:.2f}★", value=desc_text, inline=False)
         embed.add_field(name="PP values", value=pp_values_text, inline=False)
         embed.set_image(url=self.beatmapset.covers.cover)
 
         return embed
 
+    async def get_attributes(self) -> dict:
+        """
+        Returns the difficulty attributes and pp values of the beatmap, from the card cache if possible.
+        """
+        if self.cache is None:
+            return await self.calculate_attributes()
+
+        # The checksum changes when the map is updated, so cached attributes never go out of date
+        cache_key = f"map-attributes:{self.beatmap.id}:{self.mods.value}:{self.beatmap.checksum}"
+        return await self.cache.get_or_set(cache_key, self.calculate_attributes, ttl=self.attributes_ttl)
+
+    async def calculate_attributes(self) -> dict:
+        """
+        Calculates the difficulty attributes and the pp values for 100, 99, 97 and 95% accuracy.
+        """
+        beatmap_path = await download_and_save_beatmap(self.beatmap.id, self.beatmap.checksum)
+        beatmap = rosu.Beatmap(path=beatmap_path)
+        calc = rosu.Calculator(mods=self.mods.value)
+        map_attributes = calc.map_attributes(beatmap)
+        diff_attributes = calc.difficulty(beatmap)
+        pp_values = []
+        for acc in [100, 99, 97, 95]:
+            calc.set_acc(acc)
+            pp_values.append(calc.performance(beatmap).pp)
+
+        return {'cs': map_attributes.cs, 'ar': diff_attributes.ar, 'od': diff_attributes.od, 'hp': map_attributes.hp,
+                'bpm': map_attributes.bpm, 'n_circles': map_attributes.n_circles,
+                'n_sliders': map_attributes.n_sliders, 'stars': diff_attributes.stars, 'pp_values': pp_values}
+
 
 class MapCardFactory:
-    def __init__(self, beatmap_details: SimpleNamespace):
+    def __init__(self, beatmap_details: Beatmap, cache: Optional[TieredCache] = None):
         self.beatmap_details = beatmap_details
-        pass
+        self.cache = cache
 
     def get_card(self):
-        return EmbedMapCard(self.beatmap_details)
+        return EmbedMapCard(self.beatmap_details, cache=self.cache)
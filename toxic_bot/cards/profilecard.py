@@ -1,15 +1,17 @@
+import hashlib
 import os
-from types import SimpleNamespace
+from typing import Optional
 
 import nextcord
 from PIL import Image, ImageFont
 from PIL import ImageDraw
 from colour import Color
-from reportlab.graphics.renderPM import drawToPIL
-from svglib.svglib import svg2rlg
 
+from toxic_bot.helpers.flags import FlagCache
 from toxic_bot.helpers.http_downloader import download_and_save_asset
-from toxic_bot.helpers.image import pillow_image_to_discord_file
+from toxic_bot.helpers.image import pillow_image_to_png, png_to_discord_file
+from toxic_bot.helpers.models import User, dumps
+from toxic_bot.helpers.render_cache import RenderCache
 
 
 class ProfileCard:
@@ -18,7 +20,7 @@ class ProfileCard:
                       'fruits': 'Ctb',
                       'mania': 'Mania'}
 
-    def __init__(self, user_details: SimpleNamespace):
+    def __init__(self, user_details: User):
         self.user = user_details
         self.game_mode = self.game_mode_dict[user_details.playmode]
 
@@ -95,11 +97,30 @@ class ImageProfileCard(ProfileCard):
     groups_font_path = os.path.join("assets", "fonts", "Torus Bold.otf")
     fontawesome_path = os.path.join("assets", "fonts", "fontawesome-regular.ttf")
 
-    def __init__(self, user_details: SimpleNamespace):
+    # Increase whenever the drawing changes, so cached renders of the old card aren't used
+    render_version = 1
+
+    def __init__(self, user_details: User, render_cache: Optional[RenderCache] = None,
+                 flag_cache: Optional[FlagCache] = None):
         super().__init__(user_details)
+        self.render_cache = render_cache
+        self.flag_cache = flag_cache if flag_cache is not None else FlagCache()
         self.profile_card = None
 
     async def to_embed(self):
+        render_key = self.render_key()
+        png = await self.render_cache.get(render_key) if self.render_cache is not None else None
+        if png is None:
+            png = pillow_image_to_png(await self.draw_card())
+            if self.render_cache is not None:
+                await self.render_cache.set(render_key, png)
+
+        embed = super(ImageProfileCard, self).to_embed()
+        file = png_to_discord_file(png, "profile.png")
+
+        return embed, file
+
+    async def draw_card(self) -> Image.Image:
         self.profile_card = Image.new('RGBA', self.card_size, self.osu_dark_bg)
 
         await self.draw_lower_part()
@@ -108,10 +129,19 @@ class ImageProfileCard(ProfileCard):
         await self.draw_pp_rank()
         await self.draw_details(title_font_size=22, value_font_size=36, title_margin=5, value_margin=50)
 
-        embed = super(ImageProfileCard, self).to_embed()
-        file = pillow_image_to_discord_file(self.profile_card, "profile.png")
+        return self.profile_card
 
-        return embed, file
+    def render_key(self) -> str:
+        """
+        Returns the render cache key of the user, a digest of every field drawn on the card.
+        """
+        statistics = self.user.statistics
+        snapshot = [self.user.id, self.game_mode, self.user.username, self.user.avatar_url, self.user.title,
+                    self.user.groups, self.user.support_level, self.user.country_code, self.user.country.name,
+                    statistics.global_rank, statistics.country_rank, statistics.play_time, statistics.pp,
+                    len(self.user.user_achievements)]
+        digest = hashlib.sha1(dumps(snapshot)).hexdigest()
+        return f'profile:{digest}:v{self.render_version}'
 
     async def draw_pp_rank(self):
         global_rank_text = f'#{self.user.statistics.global_rank}'
@@ -221,23 +251,7 @@ class ImageProfileCard(ProfileCard):
                                   self.country_separator_color)
 
         # Draw country flag
-        country_flag_url = 'https://osu.ppy.sh/assets/images/flags/'
-        code_nums = '-'.join([f'1f1{hex(0xA5 + ord(code))[2:]}' for code in self.user.country_code])
-        country_flag_url += f'{code_nums}.svg'
-        country_flag_path = await download_and_save_asset(country_flag_url)
-        country_flag_rlg = svg2rlg(country_flag_path)
-        country_flag = drawToPIL(country_flag_rlg, dpi=72 * 1.5, bg=0x00000)
-        country_flag = country_flag.convert('RGBA')
-        img_data = country_flag.getdata()
-        newData = []
-        for item in img_data:
-            if item[0] == 0 and item[1] == 0 and item[2] == 0:
-                newData.append((0, 0, 0, 0))
-            else:
-                newData.append(item)
-
-        country_flag.putdata(newData)
-
+        country_flag = await self.flag_cache.get(self.user.country_code)
         self.profile_card.paste(country_flag, (country_separator_x,
                                                country_separator_y + self.separator_height +
                                                self.country_flag_margin[1]), mask=country_flag)
@@ -295,8 +309,11 @@ class EmbedProfileCard(ProfileCard):
 
 
 class ProfileCardFactory:
-    def __init__(self, user_details: SimpleNamespace):
+    def __init__(self, user_details: User, render_cache: Optional[RenderCache] = None,
+                 flag_cache: Optional[FlagCache] = None):
         self.user = user_details
+        self.render_cache = render_cache
+        self.flag_cache = flag_cache
 
     def get_card(self):
-        return ImageProfileCard(self.user)
+        return ImageProfileCard(self.user, self.render_cache, self.flag_cache)
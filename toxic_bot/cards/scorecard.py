@@ -1,24 +1,26 @@
 from abc import ABC
 from datetime import datetime, timezone
-from types import SimpleNamespace
-from typing import List, Tuple, Union
+from typing import List, Optional, Tuple, Union
 
-import PIL
+import aiohttp
 import nextcord
-from PIL import Image, ImageFilter, ImageDraw
+from PIL import ImageDraw
 from ossapi import Mod
 from ossapi.enums import Grade
 from rosu_pp_py import Calculator, Beatmap, DifficultyAttributes, BeatmapAttributes, PerformanceAttributes
 
+from toxic_bot.helpers.cover_cache import CoverCache, prepare_cover
 from toxic_bot.helpers.http_downloader import download_and_save_asset, download_and_save_beatmap
 from toxic_bot.helpers.image import PPTextBox, ScoreBox, StarRatingTextBox, TitleTextBox, DifficultyTextBox, \
-    JudgementsBox, ModsIcon, ScoreGradeVisual, pillow_image_to_discord_file, IfFCTextBox
+    JudgementsBox, ModsIcon, ScoreGradeVisual, IfFCTextBox, pillow_image_to_png, png_to_discord_file
+from toxic_bot.helpers.models import Score
 from toxic_bot.helpers.primitives import Point
+from toxic_bot.helpers.render_cache import RenderCache
 from toxic_bot.helpers.time import time_ago
 
 
 class ScoreCard:
-    def __init__(self, scores: List[SimpleNamespace]):
+    def __init__(self, scores: List[Score]):
         self.scores = scores
 
     def to_embed(self):
@@ -36,12 +38,13 @@ class EmbedScoreCard(ScoreCard, ABC):
 
 class ImageScoreCard(ScoreCard, ABC):
 
-    def __init__(self, scores: List[SimpleNamespace]):
+    def __init__(self, scores: List[Score], render_cache: Optional[RenderCache] = None):
         super().__init__(scores)
+        self.render_cache = render_cache
         self.image = None
         self.score = None
 
-    async def draw_image(self, score: SimpleNamespace):
+    async def draw_image(self, score: Score):
         """
         Draws the play card and returns it
         """
@@ -51,7 +54,7 @@ class ImageScoreCard(ScoreCard, ABC):
         """
         Sends the play card to the current context channel
         """
-        file = pillow_image_to_discord_file(self.image, 'score.png')
+        file = png_to_discord_file(self.image, 'score.png')
         embed = nextcord.Embed(
             title=f'{self.score.beatmapset.artist} - {self.score.beatmapset.title} [{self.score.beatmap.version}]',
             url=self.score.beatmap.url)
@@ -62,21 +65,32 @@ class ImageScoreCard(ScoreCard, ABC):
         footer_time = time_ago(datetime.now(tz=timezone.utc),
                                datetime.strptime(self.score.created_at, "%Y-%m-%dT%H:%M:%SZ").replace(
                                    tzinfo=timezone.utc))
-        embed.set_footer(text=f'▸ Score set {footer_time}Ago')
+        footer_text = f'▸ Score set {footer_time}Ago'
+        if self.score.is_stale:
+            footer_text += ' • osu! is unreachable, showing cached data'
+        embed.set_footer(text=footer_text)
         return embed, file
 
 
 class SingleImageScoreCard(ImageScoreCard, ABC):
+    # Increase whenever the drawing changes, so cached renders of the old card aren't used
+    render_version = 1
 
-    def __init__(self, scores: List[SimpleNamespace], index: int):
-        super().__init__(scores)
+    def __init__(self, scores: List[Score], index: int, render_cache: Optional[RenderCache] = None,
+                 cover_cache: Optional[CoverCache] = None):
+        super().__init__(scores, render_cache)
+        self.cover_cache = cover_cache
         self.score = scores[index]
         if not hasattr(self.score, 'id'):
             self.score = self.score.score
 
-    async def draw_image(self, score: SimpleNamespace):
-        cover_image_path = await download_and_save_asset(score.beatmapset.covers.__getattribute__('card@2x'))
-        beatmap_path = await download_and_save_beatmap(score.beatmap.id)
+    async def draw_image(self, score: Score):
+        try:
+            cover_image_path = await download_and_save_asset(getattr(score.beatmapset.covers, 'card@2x'))
+        except aiohttp.ClientError:
+            # Cards of beatmapsets without a cover get the plain background
+            cover_image_path = None
+        beatmap_path = await download_and_save_beatmap(score.beatmap.id, getattr(score.beatmap, 'checksum', None))
         bmap = Beatmap(path=beatmap_path)
         mods = Mod(score.mods)
         calculator = Calculator(mods=mods.value,
@@ -94,15 +108,11 @@ class SingleImageScoreCard(ImageScoreCard, ABC):
         score.pp = curr_perf.pp
         score.accuracy *= 100
 
-        try:
-            cover = Image.open(cover_image_path)
-        except PIL.UnidentifiedImageError:
-            cover = Image.new('RGB', (800, 280), (45, 45, 45))
-        cover = cover.resize((800, 280), Image.LANCZOS)
-        cover = cover.filter(ImageFilter.GaussianBlur(radius=1.25))
+        if self.cover_cache is None:
+            cover = prepare_cover(cover_image_path)
+        else:
+            cover = await self.cover_cache.get(score.beatmapset.id, cover_image_path)
         cover_draw = ImageDraw.Draw(cover, "RGBA")
-        cover_draw.rounded_rectangle((Point(10, 10), Point(cover.width - 10, cover.height - 10)), radius=10,
-                                     fill=(0, 0, 0, 200))
         right_offset = int(cover.width / 8 * 3)
         title = TitleTextBox(score.beatmapset.title)
         difficulty = DifficultyTextBox(f'[{beatmap.version}]')
@@ -160,9 +170,23 @@ class SingleImageScoreCard(ImageScoreCard, ABC):
         """
         Sends the image file to the channel
         """
-        self.image = await self.draw_image(self.score)
+        if self.render_cache is None:
+            self.image = pillow_image_to_png(await self.draw_image(self.score))
+            return await super().to_embed()
+
+        render_key = self.render_key(self.score)
+        self.image = await self.render_cache.get(render_key)
+        if self.image is None:
+            self.image = pillow_image_to_png(await self.draw_image(self.score))
+            await self.render_cache.set(render_key, self.image)
         return await super().to_embed()
 
+    def render_key(self, score: Score) -> str:
+        """
+        Returns the render cache key of the score. Scores never change, only the beatmap they are drawn with can.
+        """
+        return f'score:{score.mode}:{score.id}:{getattr(score.beatmap, "checksum", None)}:v{self.render_version}'
+
 
 class MultiEmbedScoreCard(ImageScoreCard, ABC):
     pass
@@ -173,11 +197,12 @@ class ScoreCardFactory(object):
     Factory class for creating ScoreCard objects.
     """
 
-    def __init__(self, scores: List[SimpleNamespace], index: int = 0, mode: str = 'single'):
+    def __init__(self, scores: List[Score], index: int = 0, mode: str = 'single',
+                 render_cache: Optional[RenderCache] = None, cover_cache: Optional[CoverCache] = None):
         if mode == 'multi':
-            self.score_card = MultiEmbedScoreCard(scores)
+            self.score_card = MultiEmbedScoreCard(scores, render_cache)
         else:
-            self.score_card = SingleImageScoreCard(scores, index)
+            self.score_card = SingleImageScoreCard(scores, index, render_cache, cover_cache)
 
     def get_card(self) -> Union[SingleImageScoreCard, MultiEmbedScoreCard]:
         return self.score_card
@@ -13,7 +13,7 @@ class MapInteractions(commands.Cog):
         embed_url = interaction.message.embeds[0].url
         beatmap_id = int(embed_url.split('/')[-1])
         beatmap_info = await self.bot.api.get_beatmap(beatmap_id)
-        map_card = MapCardFactory(beatmap_info).get_card()
+        map_card = MapCardFactory(beatmap_info, cache=self.bot.card_cache).get_card()
         embed = await map_card.to_embed()
         await interaction.send(embed=embed)
 
@@ -12,6 +12,7 @@ from toxic_bot.cards.profilecard import ProfileCardFactory
 from toxic_bot.helpers.crypto import encrypt
 from toxic_bot.helpers.database import Database
 from toxic_bot.helpers.osu_api import OsuApiV2
+from toxic_bot.helpers.parser import ParserExceptionNoUserFound
 from toxic_bot.views.profile_extras import ProfileExtrasView
 
 logger = logging.getLogger('toxic-bot')
@@ -80,15 +81,18 @@ class Profile(commands.Cog):
         user_from_db = await self.bot.get_user_from_db(interaction, name)
 
         if user_from_db is None:
-            user_details = await self.api.get_user(name, key='username')
+            user_details = await self.api.get_user_by_name(name)
         else:
             user_details = await self.api.get_user(user_from_db['osu_id'])
 
+        if user_details is None:
+            raise ParserExceptionNoUserFound(f'User `{name}` was not found on osu!')
         return user_details
 
     async def profile_core(self, interaction: Union[Context, Interaction], osu_username: Optional[str]):
         user_details = await self.get_user_details(interaction, osu_username)
-        profile_card = ProfileCardFactory(user_details).get_card()
+        profile_card = ProfileCardFactory(user_details, render_cache=self.bot.render_cache,
+                                          flag_cache=self.bot.flag_cache).get_card()
         embed, file = await profile_card.to_embed()
         view = ProfileExtrasView()
         await interaction.send(embed=embed, file=file, view=view)
@@ -1,7 +1,8 @@
+import asyncio
 import datetime
 import logging
-from types import SimpleNamespace
-from typing import List, Optional, Union
+import time
+from typing import AsyncIterator, List, Optional, Union
 
 import nextcord
 from nextcord import SlashOption, Interaction
@@ -12,14 +13,21 @@ from nextcord.ext.commands import CommandError, Context
 from toxic_bot.bots.discord import DiscordOsuBot
 from toxic_bot.cards.scorecard import ScoreCardFactory, SingleImageScoreCard
 from toxic_bot.helpers.database import Database
-from toxic_bot.helpers.osu_api import OsuApiV2
+from toxic_bot.helpers.models import ApiObject, Beatmap, Score
+from toxic_bot.helpers.osu_api import OsuApiUnavailable, OsuApiV2
 from toxic_bot.helpers.paginated_view import PaginatedView
+from toxic_bot.helpers.rate_limiter import Priority
 from toxic_bot.views.score_extras import ScoreExtrasView
 
 logger = logging.getLogger('toxic-bot')
 
 
 class ScoreInteractions(commands.Cog):
+    # Linked members whose scores are requested at the same time for a guild leaderboard
+    guild_leaderboard_concurrency = 8
+    # Seconds between edits of a guild leaderboard while its scores are arriving
+    guild_leaderboard_update_interval = 2
+
     def __init__(self, bot: DiscordOsuBot):
         self.bot = bot
         self.api: OsuApiV2 = bot.api
@@ -172,6 +180,21 @@ class ScoreInteractions(commands.Cog):
         await interaction.response.defer()
         await self.country_core(interaction, beatmap_id)
 
+    @nextcord.slash_command(name="gl",
+                            description="Shows the leaderboard of this server's linked members on the beatmap")
+    async def guild_leaderboard_interaction(self,
+                                            interaction: Interaction,
+                                            beatmap_id: int = SlashOption(
+                                                name="beatmap_id",
+                                                description="Beatmap ID for the server rankings",
+                                                required=True)):
+        """
+        Shows the rankings of the server's linked members on the beatmap
+        """
+        logger.debug(f'Guild leaderboard slash command called with args: {beatmap_id}')
+        await interaction.response.defer()
+        await self.guild_leaderboard_core(interaction, beatmap_id)
+
     async def compare_core(self, interaction, message: nextcord.Message):
         if not message.author.id == self.bot.application_id:
             raise CommandError("Couldn't find a score on this message. Please use it on a score.")
@@ -190,7 +213,7 @@ class ScoreInteractions(commands.Cog):
                 plays = await self.get_user_beatmap_scores(interaction, user_id, beatmap_id)
                 if plays is None:
                     raise CommandError("You don't have any scores on this map.")
-                if isinstance(plays, SimpleNamespace):
+                if isinstance(plays, ApiObject):
                     await self._single_score_core(0, [plays], interaction)
                 else:
                     await self._multi_score_core(plays, interaction)
@@ -202,15 +225,92 @@ class ScoreInteractions(commands.Cog):
         beatmap_metadata = await self.api.get_beatmap(beatmap_id=beatmap_id)
         await self._country_scores_core(country_scores, beatmap_metadata, interaction)
 
-    async def _country_scores_core(self, plays: List[SimpleNamespace],
-                                   beatmap_meta: SimpleNamespace,
+    async def guild_leaderboard_core(self, interaction: Union[Interaction, Context], beatmap_id: int):
+        """
+        Sends the guild leaderboard of the beatmap and updates it while the scores of the members arrive.
+        """
+        if interaction.guild is None:
+            raise CommandError("Server leaderboards can only be used in a server.")
+        beatmap_meta = await self.api.get_beatmap(beatmap_id=beatmap_id)
+        if beatmap_meta is None:
+            raise CommandError(f"Couldn't find the beatmap `{beatmap_id}`.")
+
+        linked_users = await self.db.get_users(member.id for member in interaction.guild.members if not member.bot)
+        osu_ids = list(dict.fromkeys(int(user['osu_id']) for user in linked_users.values() if user is not None))
+        if not osu_ids:
+            raise CommandError("Nobody in this server has linked their osu! profile yet. Use /link to link yours.")
+
+        plays: List[Score] = []
+        view = PaginatedView(self.guild_scores_to_embed(plays, beatmap_meta, interaction.guild.name, 0, len(osu_ids)))
+        message = await interaction.send(embed=view.embeds[0], view=view)
+
+        fetched = 0
+        last_update = time.monotonic()
+        async for play in self.get_guild_beatmap_scores(osu_ids, beatmap_id):
+            fetched += 1
+            if play is not None:
+                plays.append(play)
+            # Edits are throttled, Discord rate limits them per message
+            if fetched < len(osu_ids) and time.monotonic() - last_update >= self.guild_leaderboard_update_interval:
+                await self._update_paginated_message(message, view, self.guild_scores_to_embed(
+                    plays, beatmap_meta, interaction.guild.name, fetched, len(osu_ids)))
+                last_update = time.monotonic()
+
+        await self._update_paginated_message(message, view, self.guild_scores_to_embed(
+            plays, beatmap_meta, interaction.guild.name, fetched, len(osu_ids)))
+
+    @staticmethod
+    async def _update_paginated_message(message, view: PaginatedView, embeds: List[Embed]):
+        view.embeds = embeds
+        view.embed_idx = min(view.embed_idx, len(embeds) - 1)
+        await message.edit(embed=embeds[view.embed_idx], view=view)
+
+    async def _country_scores_core(self, plays: List[Score],
+                                   beatmap_meta: Beatmap,
                                    interaction: Interaction):
         embeds = await self.country_scores_to_embed(plays, beatmap_meta)
         view = PaginatedView(embeds)
         await interaction.send(embed=embeds[0], view=view)
 
     @staticmethod
-    async def country_scores_to_embed(plays: List[SimpleNamespace], beatmap_meta: SimpleNamespace) -> List[Embed]:
+    def guild_scores_to_embed(plays: List[Score], beatmap_meta: Beatmap, guild_name: str, fetched: int,
+                              total: int) -> List[Embed]:
+        plays = sorted(plays, key=lambda play: play.score, reverse=True)
+        embeds: List[Embed] = []
+        for i in range(0, max(len(plays), 1), 5):
+            embed = Embed()
+            beatmap_stars = f"{beatmap_meta.difficulty_rating:.2f}"
+            embed.title = f"{beatmap_meta.beatmapset.artist} - {beatmap_meta.beatmapset.title} " \
+                          f"({beatmap_meta.beatmapset.creator}) [{beatmap_meta.version}] {beatmap_stars}⭐"
+            embed.url = beatmap_meta.url
+            embed.set_image(url=beatmap_meta.beatmapset.covers.cover)
+            embed.set_author(name=f"{guild_name} Ranks")
+
+            embed_desc = ""
+            for offset, play in enumerate(plays[i:i + 5]):
+                player_url = f"https://osu.ppy.sh/users/{play.user_id}"
+                player_mods = "".join(play.mods) if len(play.mods) > 0 else "NoMod"
+                play_ts = int(datetime.datetime.strptime(play.created_at, "%Y-%m-%dT%H:%M:%SZ").timestamp())
+                embed_desc += f"**{i + offset + 1}. [{play.user.username}]({player_url})** - <t:{play_ts}:d>\n"
+                embed_desc += f"**{play.rank} Rank** - {play.score:,} (x{play.max_combo}) -" \
+                              f" {play.accuracy * 100:.2f}% {player_mods}"
+                if play.pp is not None:
+                    embed_desc += f" - **{play.pp:.2f}pp**"
+                embed_desc += f" ({play.statistics.count_miss} miss)\n\n"
+
+            if not plays:
+                embed_desc = "No scores yet..." if fetched < total else "Nobody in this server has a score on this map."
+            embed.description = embed_desc
+            if fetched < total:
+                embed.set_footer(text=f"Checked {fetched}/{total} linked members...")
+            else:
+                embed.set_footer(text=f"Checked {total} linked members")
+            embeds.append(embed)
+
+        return embeds
+
+    @staticmethod
+    async def country_scores_to_embed(plays: List[Score], beatmap_meta: Beatmap) -> List[Embed]:
         embeds: List[Embed] = []
         for i in range(0, len(plays), 5):
             embed = Embed()
@@ -258,32 +358,50 @@ class ScoreInteractions(commands.Cog):
 
         return embeds
 
-    async def _multi_score_core(self, plays: List[SimpleNamespace],
+    async def _multi_score_core(self, plays: List[Score],
                                 interaction: Interaction):
         embed = nextcord.Embed(title="We are sorry", description="This feature is not yet implemented")
         await interaction.send(embed=embed)
 
-    async def _single_score_core(self, play_index: int, plays: List[SimpleNamespace],
+    async def _single_score_core(self, play_index: int, plays: List[Score],
                                  interaction: Union[Interaction, Context]):
         """
         Core function for single score commands
         """
-        play_card: SingleImageScoreCard = ScoreCardFactory(plays, play_index).get_card()
-        if not hasattr(play_card.score, 'beatmapset'):
-            beatmap = await self.api.get_beatmap(play_card.score.beatmap.id)
-            play_card.score.beatmapset = beatmap.beatmapset
+        play_card: SingleImageScoreCard = ScoreCardFactory(plays, play_index,
+                                                           render_cache=self.bot.render_cache,
+                                                           cover_cache=self.bot.cover_cache).get_card()
+        await self._attach_beatmapsets([play_card.score])
         embed, file = await play_card.to_embed()
+        # The other scores of the list are likely asked for next
+        self.bot.prefetcher.prefetch(interaction.channel.id, plays, play_index)
         view = ScoreExtrasView()
         await interaction.send(embed=embed, file=file, view=view)
 
+    async def _attach_beatmapsets(self, plays: List[Score]):
+        """
+        Adds the beatmapset to the plays that don't have it, with one batched beatmap lookup.
+        """
+        plays = [play for play in plays if not hasattr(play, 'beatmapset')]
+        if not plays:
+            return
+
+        beatmaps = await self.api.get_beatmaps(play.beatmap.id for play in plays)
+        for play in plays:
+            beatmap = beatmaps.get(play.beatmap.id)
+            if beatmap is not None:
+                play.beatmapset = beatmap.beatmapset
+
     async def get_user_plays(self, interaction: Union[Context, Interaction], game_mode: str, name: str, score_type: str,
                              passes_only: bool = False, all_scores: bool = False):
         user_id = await self.bot.get_user_id(interaction, name)
+        if all_scores:
+            return [play async for play in self.api.iter_user_scores(user_id=user_id, score_type=score_type,
+                                                                     mode=game_mode,
+                                                                     include_fails=0 if passes_only else 1)]
+
         plays = await self.api.get_user_scores(user_id=user_id, score_type=score_type, mode=game_mode,
                                                include_fails=0 if passes_only else 1)
-        if all_scores:
-            plays.extend(await self.api.get_user_scores(user_id=user_id, score_type=score_type, mode=game_mode,
-                                                        include_fails=0 if passes_only else 1, offset=50))
         return plays
 
     async def get_user_beatmap_scores(self, interaction: Union[Context, Interaction], name: str, beatmap_id: int):
@@ -291,6 +409,35 @@ class ScoreInteractions(commands.Cog):
         plays = await self.api.get_user_beatmap_score(user_id=user_id, beatmap_id=beatmap_id)
         return plays
 
+    async def get_guild_beatmap_scores(self, osu_ids: List[int], beatmap_id: int) -> AsyncIterator[Optional[Score]]:
+        """
+        Requests the scores of many users on a beatmap concurrently, in the background lane of the rate limiter,
+        and yields them as they arrive. Responses are cached per user, so running it again only requests expired ones.
+        :param osu_ids: osu! user ids.
+        :param beatmap_id: Beatmap id.
+        :return: Score of every user, None for users without a score or whose request failed.
+        """
+        semaphore = asyncio.Semaphore(self.guild_leaderboard_concurrency)
+
+        async def get_score(osu_id: int) -> Optional[Score]:
+            async with semaphore:
+                try:
+                    user_score = await self.api.get_user_beatmap_score(user_id=osu_id, beatmap_id=beatmap_id,
+                                                                       priority=Priority.BACKGROUND)
+                except OsuApiUnavailable as e:
+                    logger.warning(f"Couldn't get the score of {osu_id} on {beatmap_id}: {e}")
+                    return None
+            return user_score.score if user_score is not None else None
+
+        tasks = [asyncio.ensure_future(get_score(osu_id)) for osu_id in osu_ids]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # The consumer stopped early or failed, don't keep spending the rate limit
+            for task in tasks:
+                task.cancel()
+
 
 def setup(bot):
     bot.add_cog(ScoreInteractions(bot))
@@ -0,0 +1,360 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+from toxic_bot.helpers.models import dumps, loads
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger('toxic-bot')
+
+
+def pack(value: Any) -> bytes:
+    """
+    Serializes a value for the shared cache, with msgpack if it is installed and JSON otherwise.
+    The first byte tells which one was used, so processes with and without msgpack can share a cache.
+    """
+    if msgpack is not None:
+        return b'm' + msgpack.packb(value, use_bin_type=True)
+    return b'j' + dumps(value)
+
+
+def unpack(data: bytes) -> Any:
+    """
+    Deserializes a value packed with `pack`.
+    """
+    if data[:1] == b'm':
+        if msgpack is None:
+            raise ValueError('Cached value was packed with msgpack, which is not installed')
+        return msgpack.unpackb(data[1:], raw=False, strict_map_key=False)
+    return loads(data[1:])
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'size')
+
+    def __init__(self, value: Any, expires_at: Optional[float], size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+    def expired(self, now: float) -> bool:
+        return self.expires_at is not None and now >= self.expires_at
+
+
+class TTLCache:
+    """
+    In-memory LRU cache where every entry can have its own time to live.
+
+    The cache is bounded by number of entries and optionally by the total size of the entries.
+    Expired entries are not served by `get` but stay in the cache until they are evicted,
+    and can still be read with `get_stale`.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_size: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        """
+        :param max_entries: Maximum number of entries kept in the cache.
+        :param max_size: Maximum total size of the entries, in the unit returned by `sizeof`.
+        :param sizeof: Function that returns the size of a value. Every value has size 1 if not given.
+        """
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self._sizeof = sizeof
+        self._entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and not entry.expired(time.monotonic())
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the cached value for the key, or default if it is missing or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry.expired(time.monotonic()):
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def lookup(self, key: Hashable) -> Tuple[Any, bool]:
+        """
+        Returns the cached value for the key even if it is expired, and whether it is still fresh.
+        Only fresh values count as hits.
+        :return: Value and freshness, (None, False) if the key was evicted.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry.expired(time.monotonic()):
+            self.misses += 1
+        else:
+            self.hits += 1
+        if entry is None:
+            return None, False
+
+        self._entries.move_to_end(key)
+        return entry.value, not entry.expired(time.monotonic())
+
+    def get_stale(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the cached value for the key even if it is expired, or default if it was evicted.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+
+        self._entries.move_to_end(key)
+        self.stale_hits += 1
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, size: Optional[int] = None):
+        """
+        Stores a value in the cache.
+        :param key: Cache key.
+        :param value: Value to store.
+        :param ttl: Seconds the value stays fresh. Never expires if not given.
+        :param size: Size of the value. Calculated with `sizeof` if not given.
+        """
+        if size is None:
+            size = self._sizeof(value) if self._sizeof is not None else 1
+        if self.max_size is not None and size > self.max_size:
+            return
+
+        self.pop(key)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = _Entry(value, expires_at, size)
+        self.size += size
+        self._evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self.size -= entry.size
+        return entry.value
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {'entries': len(self._entries),
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stale_hits': self.stale_hits,
+                'evictions': self.evictions}
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or (self.max_size is not None and self.size > self.max_size):
+            _, entry = self._entries.popitem(last=False)
+            self.size -= entry.size
+            self.evictions += 1
+
+
+class ResponseCache:
+    """
+    Cache of decoded osu!api responses, used by OsuApiV2.
+
+    Methods are coroutines so subclasses can keep responses in other storages.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 64 * 1024 * 1024):
+        """
+        :param max_entries: Maximum number of responses kept in memory.
+        :param max_bytes: Maximum total size of the kept responses, measured by their encoded size.
+        """
+        self._memory = TTLCache(max_entries=max_entries, max_size=max_bytes)
+
+    async def get(self, key: str) -> Any:
+        """
+        Returns the cached response, or None if it is not cached or expired.
+        """
+        return self._memory.get(key)
+
+    async def get_stale(self, key: str) -> Any:
+        """
+        Returns the last cached response even if it is expired, or None if there is none.
+        """
+        return self._memory.get_stale(key)
+
+    async def lookup(self, key: str) -> Tuple[Any, bool]:
+        """
+        Returns the last cached response even if it is expired, and whether it is still fresh.
+        :return: Response and freshness, (None, False) if there is none.
+        """
+        return self._memory.lookup(key)
+
+    async def set(self, key: str, value: Any, ttl: float, size: int = 1):
+        """
+        Stores a response.
+        :param key: Cache key of the request.
+        :param value: Decoded JSON response.
+        :param ttl: Seconds the response stays fresh.
+        :param size: Encoded size of the response in bytes.
+        """
+        self._memory.set(key, value, ttl=ttl, size=size)
+
+    def stats(self) -> dict:
+        return self._memory.stats()
+
+
+class TieredCache(ResponseCache):
+    """
+    Cache shared by every bot process: an in-process LRU in front of Redis.
+
+    Values are kept in Redis past their TTL for `stale_ttl` seconds, so `get_stale` works across processes too.
+    Redis errors are logged and counted, the cache keeps working from memory until Redis is back.
+    """
+
+    def __init__(self, database, namespace: str, max_entries: int = 4096, max_bytes: int = 64 * 1024 * 1024,
+                 stale_ttl: float = 6 * 60 * 60):
+        """
+        :param database: Database whose binary Redis client stores the second tier. Only memory is used until it
+            is initialized.
+        :param namespace: Prefix of the Redis keys of this cache.
+        :param max_entries: Maximum number of values kept in memory.
+        :param max_bytes: Maximum total size of the values kept in memory, measured by their packed size.
+        :param stale_ttl: Seconds values stay in Redis after they expire.
+        """
+        super().__init__(max_entries=max_entries, max_bytes=max_bytes)
+        self._database = database
+        self.namespace = namespace
+        self.stale_ttl = stale_ttl
+
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.redis_errors = 0
+
+    @property
+    def _redis(self):
+        return getattr(self._database, 'binary_c', None)
+
+    def _redis_key(self, key: str) -> str:
+        return f'cache:{self.namespace}:{key}'
+
+    async def get(self, key: str) -> Any:
+        """
+        Returns the cached value, or None if it is not cached or expired.
+        """
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+
+        cached = await self._get_redis(key)
+        if cached is None:
+            return None
+        fresh_until, value = cached
+        return value if fresh_until is None or fresh_until > time.time() else None
+
+    async def get_stale(self, key: str) -> Any:
+        """
+        Returns the last cached value even if it is expired, or None if there is none.
+        """
+        value = self._memory.get_stale(key)
+        if value is not None:
+            return value
+
+        cached = await self._get_redis(key)
+        return cached[1] if cached is not None else None
+
+    async def lookup(self, key: str) -> Tuple[Any, bool]:
+        """
+        Returns the last cached value even if it is expired, and whether it is still fresh.
+        Redis is read at most once, only if memory has no fresh value.
+        :return: Value and freshness, (None, False) if there is none.
+        """
+        value, fresh = self._memory.lookup(key)
+        if fresh:
+            return value, True
+
+        cached = await self._get_redis(key)
+        if cached is None:
+            return value, False
+        fresh_until, redis_value = cached
+        return redis_value, fresh_until is None or fresh_until > time.time()
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, size: Optional[int] = None):
+        """
+        Stores a value in memory and in Redis.
+        :param key: Cache key, without the namespace.
+        :param value: Value to store, anything msgpack or JSON can encode.
+        :param ttl: Seconds the value stays fresh. Never expires if not given.
+        :param size: Size of the value in memory. The packed size is used if not given.
+        """
+        fresh_until = time.time() + ttl if ttl is not None else None
+        packed = pack([fresh_until, value])
+        self._memory.set(key, value, ttl=ttl, size=size if size is not None else len(packed))
+
+        redis = self._redis
+        if redis is None:
+            return
+        expire = int((ttl + self.stale_ttl) * 1000) if ttl is not None else None
+        try:
+            await redis.set(self._redis_key(key), packed, px=expire)
+        except Exception as e:
+            self.redis_errors += 1
+            logger.debug(f'Could not write {key} to the {self.namespace} cache: {e!r}')
+
+    async def get_or_set(self, key: str, factory: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """
+        Returns the cached value, or awaits the factory and caches its result.
+        :param key: Cache key, without the namespace.
+        :param factory: Coroutine function that computes the value.
+        :param ttl: Seconds the computed value stays fresh. Never expires if not given.
+        """
+        value = await self.get(key)
+        if value is None:
+            value = await factory()
+            await self.set(key, value, ttl=ttl)
+        return value
+
+    async def _get_redis(self, key: str) -> Optional[list]:
+        """
+        Reads a value from Redis and keeps it in memory.
+        :return: Wall clock time the value is fresh until and the value, or None if Redis doesn't have it.
+        """
+        redis = self._redis
+        if redis is None:
+            return None
+        try:
+            packed = await redis.get(self._redis_key(key))
+            if packed is None:
+                self.redis_misses += 1
+                return None
+            fresh_until, value = unpack(packed)
+        except Exception as e:
+            self.redis_errors += 1
+            logger.debug(f'Could not read {key} from the {self.namespace} cache: {e!r}')
+            return None
+
+        self.redis_hits += 1
+        # Expired values are kept in memory too, for get_stale
+        ttl = max(0.0, fresh_until - time.time()) if fresh_until is not None else None
+        self._memory.set(key, value, ttl=ttl, size=len(packed))
+        return [fresh_until, value]
+
+    def stats(self) -> dict:
+        lookups = self.redis_hits + self.redis_misses
+        return {**self._memory.stats(),
+                'redis_hits': self.redis_hits,
+                'redis_misses': self.redis_misses,
+                'redis_hit_rate': self.redis_hits / lookups if lookups else 0.0,
+                'redis_errors': self.redis_errors}
@@ -0,0 +1,67 @@
+import logging
+import time
+
+logger = logging.getLogger('toxic-bot')
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a failing service for a while.
+
+    After `failure_threshold` failures in a row the circuit opens and requests are refused for
+    `reset_timeout` seconds. After that one trial request is let through: the circuit closes again
+    if it succeeds, and opens for another `reset_timeout` if it fails.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow_request(self) -> bool:
+        """
+        Returns whether a request may be sent now.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info(f'Circuit {self.name} closed')
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_running or self.failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning(f'Circuit {self.name} opened after {self.failures} failures')
+            self._opened_at = time.monotonic()
+        self._trial_running = False
+
+    def release_trial(self):
+        """
+        Lets another request through after a trial request was abandoned before it had a result.
+        """
+        self._trial_running = False
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import os
+from typing import Hashable, Optional, Tuple
+
+import PIL
+from PIL import Image, ImageDraw, ImageFilter
+
+from toxic_bot.helpers.cache import TTLCache
+from toxic_bot.helpers.primitives import Point
+from toxic_bot.helpers.single_flight import SingleFlight
+
+logger = logging.getLogger('toxic-bot')
+
+# Size of the score card
+cover_size = (800, 280)
+
+
+def image_size(image: Image.Image) -> int:
+    """
+    Returns the bytes the pixels of the image take in memory.
+    """
+    return image.width * image.height * len(image.getbands())
+
+
+def prepare_cover(cover_path: Optional[str], size: Tuple[int, int] = cover_size) -> Image.Image:
+    """
+    Returns the background of a score card: the cover resized to the card, blurred and darkened.
+    :param cover_path: Path of the cover image, a plain background is used if it can't be read.
+    :param size: Size of the card.
+    """
+    try:
+        cover = Image.open(cover_path)
+        # Large JPEGs are decoded at a fraction of their size, which is a lot faster than decoding all of it
+        cover.draft('RGB', size)
+        cover = cover.resize(size, Image.LANCZOS, reducing_gap=3.0)
+    except (PIL.UnidentifiedImageError, OSError, TypeError, ValueError) as e:
+        logger.debug(f'Could not read cover {cover_path}: {e!r}')
+        cover = Image.new('RGB', size, (45, 45, 45))
+    cover = cover.filter(ImageFilter.GaussianBlur(radius=1.25))
+    cover_draw = ImageDraw.Draw(cover, "RGBA")
+    cover_draw.rounded_rectangle((Point(10, 10), Point(cover.width - 10, cover.height - 10)), radius=10,
+                                 fill=(0, 0, 0, 200))
+    return cover
+
+
+class CoverCache:
+    """
+    Cache of score card backgrounds, which are the same for every score on a beatmapset.
+
+    Backgrounds are kept decoded, so they are bounded by the memory their pixels take and the least
+    recently used ones are evicted first. Callers get a copy they can draw on.
+    A background is prepared again when the modification time of its cover changes, e.g. after the
+    cover was revalidated and osu! sent a new one.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        :param max_bytes: Maximum memory the backgrounds take.
+        """
+        self._covers = TTLCache(max_entries=1024, max_size=max_bytes)
+        self._prepares = SingleFlight()
+
+    async def get(self, key: Hashable, cover_path: Optional[str]) -> Image.Image:
+        """
+        Returns a copy of the background, prepared from the cover if it isn't cached or the cover changed.
+        :param key: Key of the background, the beatmapset id.
+        :param cover_path: Path of the cover image.
+        """
+        version = self._cover_version(cover_path)
+        cached = self._covers.get(key)
+        # A cover that can't be read anymore doesn't replace a background prepared from it
+        if cached is not None and (version is None or cached[0] == version):
+            cover = cached[1]
+        else:
+            cover = await self._prepares.do((key, version), lambda: self._prepare(key, version, cover_path))
+        return cover.copy()
+
+    def stats(self) -> dict:
+        return self._covers.stats()
+
+    @staticmethod
+    def _cover_version(cover_path: Optional[str]) -> Optional[int]:
+        """
+        Returns the modification time of the cover, None if it can't be read.
+        """
+        try:
+            return os.stat(cover_path).st_mtime_ns
+        except (OSError, TypeError, ValueError):
+            return None
+
+    async def _prepare(self, key: Hashable, version: Optional[int], cover_path: Optional[str]) -> Image.Image:
+        cover = await asyncio.to_thread(prepare_cover, cover_path)
+        self._covers.set(key, (version, cover), size=image_size(cover))
+        return cover
@@ -1,7 +1,12 @@
+import asyncio
 import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
 
 import aioredis
 
+from toxic_bot.helpers.metrics import LatencyStats
 from toxic_bot.helpers.primitives import singleton
 
 logger = logging.getLogger('toxic-bot')
@@ -9,19 +14,62 @@ logger = logging.getLogger('toxic-bot')
 
 @singleton
 class Database:
+    # Guild ids whose prefix changed are published here, so every bot process drops its cached prefix
+    prefix_channel = "prefix-invalidations"
+    # Seconds to wait before subscribing again after losing the invalidation subscription
+    resubscribe_delay = 5
+    # Operations slower than this many seconds are logged
+    slow_operation_threshold = 0.25
+    # Users looked up per pipeline by get_users, so a large guild doesn't make one huge request
+    get_users_chunk_size = 500
 
-    def __init__(self, redis_url):
+    def __init__(self, redis_url, max_connections: int = 50, socket_timeout: float = 2,
+                 socket_connect_timeout: float = 2, health_check_interval: int = 30, retry_on_timeout: bool = True):
+        """
+        :param redis_url: Redis connection url
+        :param max_connections: Maximum number of pooled connections
+        :param socket_timeout: Seconds a command may wait for its reply before failing
+        :param socket_connect_timeout: Seconds to wait for a connection to be established
+        :param health_check_interval: Idle connections are pinged before reuse after this many seconds
+        :param retry_on_timeout: Reconnect and retry a command once if it times out
+        """
         self.redis_url = redis_url
         self.conn = None
         self.c = None
+        # Client without response decoding, for binary values such as the shared cache
+        self.binary_c = None
+        self._pubsub_client = None
+        self._connection_options = {"max_connections": max_connections,
+                                    "socket_timeout": socket_timeout,
+                                    "socket_connect_timeout": socket_connect_timeout,
+                                    "health_check_interval": health_check_interval,
+                                    "retry_on_timeout": retry_on_timeout}
+
+        self.latencies: Dict[str, LatencyStats] = {}
+        self.errors: Dict[str, int] = {}
+
+        # Guild id -> prefix, None for guilds using the default prefix
+        self._prefixes: Dict[int, Optional[str]] = {}
+        # Incremented on every invalidation, so a lookup racing with one doesn't cache the old prefix
+        self._prefix_generation = 0
+        self._prefix_listener: Optional[asyncio.Task] = None
 
     async def initialize(self):
         """
         Initialize database
         :return: Creates tables
         """
-        self.c = aioredis.from_url(self.redis_url, decode_responses=True)
-        logger.debug(f"Connected to redis {self.redis_url}")
+        if self.c is None:
+            self.c = aioredis.from_url(self.redis_url, decode_responses=True, **self._connection_options)
+            self.binary_c = aioredis.from_url(self.redis_url, **self._connection_options)
+            # Subscriptions are idle most of the time, so their reads must not time out
+            self._pubsub_client = aioredis.from_url(self.redis_url, decode_responses=True,
+                                                    **{**self._connection_options, "socket_timeout": None,
+                                                       "max_connections": 1})
+            logger.debug(f"Connected to redis {self.redis_url}")
+
+        if self._prefix_listener is None or self._prefix_listener.done():
+            self._prefix_listener = asyncio.create_task(self._listen_prefix_invalidations())
 
     async def set_encrypt_key(self, encryption_key: bytes):
         await self.c.set("encrypt_key", encryption_key.decode("utf-8"))
@@ -36,7 +84,14 @@ class Database:
         :param guild_id: Discord server id
         :return: Prefix of the server
         """
-        prefix = await self.c.get(f"{guild_id}")
+        if guild_id in self._prefixes:
+            return self._prefixes[guild_id]
+
+        generation = self._prefix_generation
+        with self._timed("get_prefix"):
+            prefix = await self.c.get(f"{guild_id}")
+        if generation == self._prefix_generation:
+            self._prefixes[guild_id] = prefix
         return prefix
 
     async def set_prefix(self, guild_id: int, new_prefix: str):
@@ -46,16 +101,53 @@ class Database:
         :param new_prefix: New prefix to be set
         :return: Insert prefix into database
         """
-        await self.c.set(f"{guild_id}", new_prefix)
+        with self._timed("set_prefix"):
+            await self.c.set(f"{guild_id}", new_prefix)
+            self._invalidate_prefix(guild_id)
+            await self.c.publish(self.prefix_channel, f"{guild_id}")
         logger.debug(f"Set prefix of {guild_id} to {new_prefix}")
 
+    def _invalidate_prefix(self, guild_id: Optional[int] = None):
+        """
+        Drops a cached prefix
+        :param guild_id: Discord server id, every cached prefix is dropped if not given
+        """
+        self._prefix_generation += 1
+        if guild_id is None:
+            self._prefixes.clear()
+        else:
+            self._prefixes.pop(guild_id, None)
+
+    async def _listen_prefix_invalidations(self):
+        """
+        Drops cached prefixes that are changed by any bot process, until cancelled
+        """
+        while True:
+            try:
+                async with self._pubsub_client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.prefix_channel)
+                    # Invalidations published while we weren't subscribed are lost
+                    self._invalidate_prefix()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._invalidate_prefix(int(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Lost prefix invalidation subscription: {e!r}")
+
+            # Don't serve prefixes that may have changed while we are not listening
+            self._invalidate_prefix()
+            await asyncio.sleep(self.resubscribe_delay)
+
     async def get_user(self, discord_id: int):
         """
         Get user properties from database
         :param discord_id: Discord user id
         :return: Osu related properties of user
         """
-        result = await self.c.hgetall(f"{discord_id}")
+        with self._timed("get_user"):
+            result = await self.c.hgetall(f"{discord_id}")
 
         # Empty dictionaries evaluate to False
         if not bool(result):
@@ -63,10 +155,72 @@ class Database:
             result = None
         return result
 
+    async def get_users(self, discord_ids: Iterable[int]) -> Dict[int, Optional[dict]]:
+        """
+        Get user properties of many users from database, with one pipelined round-trip per `get_users_chunk_size` users
+        :param discord_ids: Discord user ids
+        :return: Osu related properties of every user, None for users that aren't linked
+        """
+        discord_ids = list(dict.fromkeys(discord_ids))
+        users = {}
+        for i in range(0, len(discord_ids), self.get_users_chunk_size):
+            chunk = discord_ids[i:i + self.get_users_chunk_size]
+            with self._timed("get_users"):
+                async with self.c.pipeline(transaction=False) as pipe:
+                    for discord_id in chunk:
+                        pipe.hgetall(f"{discord_id}")
+                    results = await pipe.execute()
+            users.update((discord_id, result or None) for discord_id, result in zip(chunk, results))
+
+        return users
+
+    @contextmanager
+    def _timed(self, operation: str):
+        """
+        Records the latency of a database operation, and counts it as an error if it raises
+        :param operation: Name of the operation
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.latencies.setdefault(operation, LatencyStats()).add(elapsed)
+            if elapsed > self.slow_operation_threshold:
+                logger.warning(f"Redis {operation} took {elapsed * 1000:.0f} ms")
+
+    def stats(self) -> dict:
+        """
+        Returns latency and error figures per operation, and the utilisation of the connection pool
+        """
+        operations = {operation: {**latency.summary(), "errors": self.errors.get(operation, 0)}
+                      for operation, latency in self.latencies.items()}
+        pool_stats = None
+        if self.c is not None:
+            pool = self.c.connection_pool
+            # aioredis has no public API for the pool state, these are the pool's own bookkeeping
+            pool_stats = {"max_connections": pool.max_connections,
+                          "in_use": len(getattr(pool, "_in_use_connections", ())),
+                          "idle": len(getattr(pool, "_available_connections", ()))}
+        return {"operations": operations,
+                "pool": pool_stats,
+                "cached_prefixes": len(self._prefixes)}
+
     async def close(self):
         """
         Closes the database connection
         """
+        if self._prefix_listener is not None:
+            self._prefix_listener.cancel()
+            try:
+                await self._prefix_listener
+            except asyncio.CancelledError:
+                pass
         await self.c.close()
+        await self.binary_c.close()
+        await self._pubsub_client.close()
         logger.debug('Closed database connection')
         return
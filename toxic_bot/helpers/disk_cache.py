@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from toxic_bot.helpers.primitives import singleton
+
+logger = logging.getLogger('toxic-bot')
+
+
+class _File:
+    __slots__ = ('size', 'last_access', 'hits')
+
+    def __init__(self, size: int, last_access: float, hits: int = 0):
+        self.size = size
+        self.last_access = last_access
+        self.hits = hits
+
+
+@singleton
+class DiskCache:
+    """
+    Size-bounded cache of the files downloaded into the assets folder.
+
+    An in-memory index of file sizes and access times is built with one scan of the folder, after that
+    lookups of known files don't touch the disk. When the files exceed the byte budget, the least recently
+    used (or least frequently used) files are deleted until they are below the low watermark.
+    Files under the excluded folders, such as the bundled fonts and icons, and files outside the root are never
+    indexed or deleted.
+    """
+    LRU = 'lru'
+    LFU = 'lfu'
+    # Temporary files, and metadata files that are deleted along with the file they describe
+    untracked_suffixes = ('.tmp', '.meta')
+
+    def __init__(self, root: str = 'assets', max_bytes: int = 2 * 1024 * 1024 * 1024, policy: str = LRU,
+                 excluded: Iterable[str] = ('fonts', 'icons', '.renders'), low_watermark: float = 0.9):
+        """
+        :param root: Folder the files are saved in.
+        :param max_bytes: Byte budget of the files.
+        :param policy: Eviction policy, `lru` or `lfu`.
+        :param excluded: Folders under root that are not managed by the cache.
+        :param low_watermark: Fraction of the budget that eviction frees the files down to.
+        """
+        if policy not in (self.LRU, self.LFU):
+            raise ValueError(f'Unknown eviction policy {policy}')
+        self.root = os.path.normpath(root)
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.excluded = tuple(os.path.join(self.root, folder) for folder in excluded)
+        self.low_watermark = low_watermark
+
+        # Path -> file, in least recently used order
+        self._files: 'OrderedDict[str, _File]' = OrderedDict()
+        self._index_lock = asyncio.Lock()
+        self._indexed = False
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    async def initialize(self):
+        """
+        Builds the index from the files on disk. Called on first use if it wasn't called before.
+        """
+        async with self._index_lock:
+            if self._indexed:
+                return
+            start = time.perf_counter()
+            files = await asyncio.to_thread(self._scan)
+            # Files added while scanning are already in the index
+            for path, file in sorted(files.items(), key=lambda item: item[1].last_access, reverse=True):
+                if path not in self._files:
+                    self._files[path] = file
+                    self._files.move_to_end(path, last=False)
+                    self.size += file.size
+            self._indexed = True
+            logger.info(f'Indexed {len(files)} cached files, {self.size / 1024 / 1024:.1f} MiB, '
+                        f'in {time.perf_counter() - start:.2f} seconds')
+        await self._evict()
+
+    async def lookup(self, path: str) -> bool:
+        """
+        Returns whether the file is cached, and records the access.
+        """
+        path = os.path.normpath(path)
+        if self._is_excluded(path):
+            return await asyncio.to_thread(os.path.exists, path)
+        if not self._indexed:
+            await self.initialize()
+
+        file = self._files.get(path)
+        if file is None:
+            size = await asyncio.to_thread(self._file_size, path)
+            if size is None:
+                self.misses += 1
+                return False
+            # Saved by something that doesn't report to the cache
+            file = self._files[path] = _File(size, time.time())
+            self.size += size
+
+        file.hits += 1
+        file.last_access = time.time()
+        self._files.move_to_end(path)
+        self.hits += 1
+        return True
+
+    async def add(self, path: str, size: int):
+        """
+        Records a file that was just saved, and evicts files if the budget is exceeded.
+        """
+        path = os.path.normpath(path)
+        if self._is_excluded(path):
+            return
+        if not self._indexed:
+            await self.initialize()
+
+        previous = self._files.pop(path, None)
+        if previous is not None:
+            self.size -= previous.size
+        self._files[path] = _File(size, time.time())
+        self.size += size
+        if self.size > self.max_bytes:
+            await self._evict(keep=path)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {'files': len(self._files),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'evicted_bytes': self.evicted_bytes}
+
+    async def _evict(self, keep: Optional[str] = None):
+        if self.size <= self.max_bytes:
+            return
+
+        target = self.max_bytes * self.low_watermark
+        if self.policy == self.LRU:
+            candidates = list(self._files)
+        else:
+            candidates = sorted(self._files, key=lambda path: (self._files[path].hits, self._files[path].last_access))
+
+        victims: List[str] = []
+        for path in candidates:
+            if self.size <= target:
+                break
+            if path == keep:
+                continue
+            file = self._files.pop(path)
+            self.size -= file.size
+            self.evictions += 1
+            self.evicted_bytes += file.size
+            victims.append(path)
+
+        logger.debug(f'Evicting {len(victims)} cached files')
+        await asyncio.to_thread(self._remove, victims)
+
+    def _is_excluded(self, path: str) -> bool:
+        if not path.startswith(self.root + os.sep):
+            return True
+        return any(path == folder or path.startswith(folder + os.sep) for folder in self.excluded)
+
+    def _scan(self) -> Dict[str, _File]:
+        files = {}
+        folders = [self.root]
+        while folders:
+            folder = folders.pop()
+            try:
+                entries = list(os.scandir(folder))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                path = os.path.join(folder, entry.name)
+                if self._is_excluded(path):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(path)
+                elif entry.is_file(follow_symlinks=False) and not entry.name.endswith(self.untracked_suffixes):
+                    stat = entry.stat()
+                    files[path] = _File(stat.st_size, max(stat.st_atime, stat.st_mtime))
+        return files
+
+    @staticmethod
+    def _file_size(path: str) -> Optional[int]:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _remove(paths: List[str]):
+        for path in paths:
+            for file_path in (path, f'{path}.meta'):
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,145 @@
+"""
+Country flags of the profile card, rasterized once and kept as RGBA images.
+
+Flags are saved as PNGs in `flags_folder`, which can be filled ahead of time with
+
+    python -m toxic_bot.helpers.flags [COUNTRY_CODE ...]
+
+Flags that aren't there are rasterized the first time they are drawn and saved for the next start.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from PIL import Image
+from reportlab.graphics.renderPM import drawToPIL
+from svglib.svglib import svg2rlg
+
+from toxic_bot.helpers.http_downloader import download_and_save_asset, write_atomically
+from toxic_bot.helpers.http_pool import HttpPool
+from toxic_bot.helpers.image import pillow_image_to_png
+from toxic_bot.helpers.single_flight import SingleFlight
+
+logger = logging.getLogger('toxic-bot')
+
+# Folder rasterized flags are saved in, it isn't managed by the disk cache and is ignored by git
+flags_folder = os.path.join('assets', 'icons', 'flags')
+# Resolution flags are rasterized at, the SVGs are 36x36 so flags are 54x54
+flag_dpi = 72 * 1.5
+
+# ISO 3166-1 alpha-2 codes
+COUNTRY_CODES = (
+    'AD AE AF AG AI AL AM AO AQ AR AS AT AU AW AX AZ BA BB BD BE BF BG BH BI BJ BL BM BN BO BQ BR BS BT BV BW BY BZ '
+    'CA CC CD CF CG CH CI CK CL CM CN CO CR CU CV CW CX CY CZ DE DJ DK DM DO DZ EC EE EG EH ER ES ET FI FJ FK FM FO '
+    'FR GA GB GD GE GF GG GH GI GL GM GN GP GQ GR GS GT GU GW GY HK HM HN HR HT HU ID IE IL IM IN IO IQ IR IS IT JE '
+    'JM JO JP KE KG KH KI KM KN KP KR KW KY KZ LA LB LC LI LK LR LS LT LU LV LY MA MC MD ME MF MG MH MK ML MM MN MO '
+    'MP MQ MR MS MT MU MV MW MX MY MZ NA NC NE NF NG NI NL NO NP NR NU NZ OM PA PE PF PG PH PK PL PM PN PR PS PT PW '
+    'PY QA RE RO RS RU RW SA SB SC SD SE SG SH SI SJ SK SL SM SN SO SR SS ST SV SX SY SZ TC TD TF TG TH TJ TK TL TM '
+    'TN TO TR TT TV TW TZ UA UG UM US UY UZ VA VC VE VG VI VN VU WF WS YE YT ZA ZM ZW'
+).split()
+
+
+def flag_url(country_code: str) -> str:
+    """
+    Returns the url of the flag SVG osu! uses for the country
+    """
+    code_nums = '-'.join([f'1f1{hex(0xA5 + ord(code))[2:]}' for code in country_code.upper()])
+    return f'https://osu.ppy.sh/assets/images/flags/{code_nums}.svg'
+
+
+def black_to_transparent(image: Image.Image) -> Image.Image:
+    """
+    Returns the image in RGBA with its pure black pixels made transparent
+    """
+    pixels = np.array(image.convert('RGBA'))
+    pixels[(pixels[..., :3] == 0).all(axis=-1)] = 0
+    return Image.fromarray(pixels, 'RGBA')
+
+
+def rasterize_flag(svg_path: str) -> Image.Image:
+    """
+    Rasterizes a flag SVG, on a transparent background
+    """
+    return black_to_transparent(drawToPIL(svg2rlg(svg_path), dpi=flag_dpi, bg=0x00000))
+
+
+class FlagCache:
+    """
+    Rasterized country flags, read from `flags_folder` or rasterized on first use, and kept in memory.
+    """
+
+    def __init__(self):
+        self._flags: Dict[str, Image.Image] = {}
+        self._loads = SingleFlight()
+        self.rasterized = 0
+
+    async def get(self, country_code: str) -> Image.Image:
+        """
+        Returns the flag of the country as an RGBA image. It is shared, so it must not be drawn on.
+        """
+        country_code = country_code.upper()
+        flag = self._flags.get(country_code)
+        if flag is None:
+            flag = await self._loads.do(country_code, lambda: self._load(country_code))
+        return flag
+
+    def stats(self) -> dict:
+        return {'flags': len(self._flags), 'rasterized': self.rasterized}
+
+    async def _load(self, country_code: str) -> Image.Image:
+        flag = await asyncio.to_thread(self._read, country_code)
+        if flag is None:
+            svg_path = await download_and_save_asset(flag_url(country_code))
+            flag = await asyncio.to_thread(rasterize_flag, svg_path)
+            self.rasterized += 1
+            try:
+                await asyncio.to_thread(write_atomically, self._path(country_code), pillow_image_to_png(flag))
+            except OSError as e:
+                logger.warning(f'Could not save the flag of {country_code}: {e!r}')
+        self._flags[country_code] = flag
+        return flag
+
+    def _read(self, country_code: str) -> Optional[Image.Image]:
+        try:
+            with Image.open(self._path(country_code)) as flag:
+                return flag.convert('RGBA')
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _path(country_code: str) -> str:
+        return os.path.join(flags_folder, f'{country_code}.png')
+
+
+async def build(country_codes: Iterable[str]):
+    """
+    Rasterizes the flags of the countries that aren't in `flags_folder` yet.
+    """
+    flags = FlagCache()
+    failed = []
+    for country_code in country_codes:
+        try:
+            await flags.get(country_code)
+        except Exception as e:
+            logger.warning(f'Could not rasterize the flag of {country_code}: {e!r}')
+            failed.append(country_code)
+    logger.info(f'Rasterized {flags.rasterized} flags into {flags_folder}, {len(failed)} failed: {" ".join(failed)}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rasterizes the country flags of the profile card.')
+    parser.add_argument('country_codes', nargs='*', default=COUNTRY_CODES,
+                        help='Countries whose flags are rasterized. Default is every country.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        try:
+            await build(args.country_codes)
+        finally:
+            await HttpPool().close()
+
+    asyncio.run(main())
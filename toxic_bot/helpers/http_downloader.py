@@ -1,32 +1,209 @@
+import asyncio
+import hashlib
+import logging
 import os
+import tempfile
+import time
+from typing import Optional
 from urllib.parse import urlparse
 
-import aiohttp
+from toxic_bot.helpers.cache import TTLCache
+from toxic_bot.helpers.disk_cache import DiskCache
+from toxic_bot.helpers.http_pool import HttpPool
+from toxic_bot.helpers.models import dumps, loads
+from toxic_bot.helpers.single_flight import SingleFlight
 
+logger = logging.getLogger('toxic-bot')
 
-async def download_and_save_asset(url) -> str:
+# Folder downloaded assets are saved in
+assets_folder = 'assets'
+# Beatmap files are downloaded from here
+osu_url = 'https://osu.ppy.sh'
+
+# Seconds a downloaded asset is used before it is revalidated, by the host it is downloaded from.
+# Assets of other hosts are never revalidated.
+asset_max_ages = {'a.ppy.sh': 24 * 60 * 60,  # Avatars
+                  'assets.ppy.sh': 7 * 24 * 60 * 60}  # Beatmapset covers
+
+# Concurrent downloads of the same url share one request
+_downloads = SingleFlight()
+# Validators of recently used assets, so revalidation doesn't read the metadata file every time
+_metadata = TTLCache(max_entries=10000)
+# Assets whose last revalidation failed, they are served as they are until their back-off expires
+_revalidation_backoffs = TTLCache(max_entries=10000)
+# Seconds to wait before revalidating an asset again after its revalidation failed
+revalidation_retry_delay = 5 * 60
+# Checksum from the api -> path of the file that was downloaded for it, when the file had another checksum
+_checksum_aliases = TTLCache(max_entries=10000)
+# Seconds a mismatched checksum is served from the file that was downloaded for it, before downloading it again
+checksum_alias_ttl = 60 * 60
+
+# Suffix of the file an asset's ETag, Last-Modified and download time are saved in
+METADATA_SUFFIX = '.meta'
+
+
+async def download_and_save_asset(url, max_age: Optional[float] = None) -> str:
     """
-    Downloads image from url and returns PIL Image
+    Downloads the file at url if it wasn't downloaded before and returns its local path
+
+    Assets older than their max age are revalidated with a conditional request, which downloads them
+    again only if they changed.
+    :param url: Url of the asset.
+    :param max_age: Seconds the asset is used before it is revalidated. Defaults to the max age of its host
+    in `asset_max_ages`, assets without one are never revalidated.
     """
-    url_path = urlparse(url).path
-    folder_name, filename = os.path.split(url_path)
-    local_folder_path = os.path.join('assets', f'.{folder_name}')
+    parsed_url = urlparse(url)
+    folder_name, filename = os.path.split(parsed_url.path)
+    local_folder_path = os.path.join(assets_folder, f'.{folder_name}')
     asset_file_path = os.path.join(local_folder_path, filename)
-    os.makedirs(local_folder_path, exist_ok=True)
+    if max_age is None:
+        max_age = asset_max_ages.get(parsed_url.hostname)
+
+    if await DiskCache().lookup(asset_file_path):
+        if max_age is None:
+            return asset_file_path
+        metadata = await _read_metadata(asset_file_path)
+        if metadata is not None and time.time() - metadata['fetched_at'] < max_age:
+            return asset_file_path
+        if asset_file_path in _revalidation_backoffs:
+            return asset_file_path
+        return await _downloads.do(asset_file_path, lambda: _revalidate(url, asset_file_path, metadata))
+
+    return await _downloads.do(asset_file_path, lambda: _download(url, asset_file_path, max_age is not None))
+
+
+async def download_and_save_beatmap(beatmap_id, checksum: Optional[str] = None) -> str:
+    """
+    Downloads the beatmap file if it wasn't downloaded before and returns its local path
+
+    With the checksum of the beatmap from the api, files are stored by their md5, so an updated beatmap
+    is downloaded again and identical files are stored once. Without it the file is stored by beatmap id
+    and never refreshed.
+    :param beatmap_id: Id of the beatmap.
+    :param checksum: md5 of the beatmap file, the `checksum` field of the beatmap.
+    """
+    beatmap_download_url = f"{osu_url}/osu/{beatmap_id}"
+    if not checksum:
+        return await download_and_save_asset(beatmap_download_url)
+
+    beatmap_file_path = _checksum_aliases.get(checksum) or beatmap_store_path(checksum)
+    if await DiskCache().lookup(beatmap_file_path):
+        return beatmap_file_path
+
+    return await _downloads.do(beatmap_file_path, lambda: _download_beatmap(beatmap_download_url, checksum))
+
+
+def beatmap_store_path(checksum: str) -> str:
+    """
+    Returns the local path of the beatmap file with this md5
+    """
+    return os.path.join(assets_folder, 'beatmaps', 'files', f'{checksum}.osu')
 
-    if os.path.exists(asset_file_path):
-        return asset_file_path
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
+async def _download(url: str, file_path: str, save_metadata: bool = False) -> str:
+    async with HttpPool().session.get(url) as resp:
+        # Error pages must not be saved as the asset
+        resp.raise_for_status()
+        response_bytes = await resp.read()
+        headers = resp.headers
+
+    await asyncio.to_thread(write_atomically, file_path, response_bytes)
+    await DiskCache().add(file_path, len(response_bytes))
+    if save_metadata:
+        await _write_metadata(file_path, headers)
+    return file_path
+
+
+async def _revalidate(url: str, file_path: str, metadata: Optional[dict]) -> str:
+    """
+    Asks the server whether the saved asset changed, and downloads it again if it did
+    """
+    headers = {}
+    if metadata is not None and metadata.get('etag'):
+        headers['If-None-Match'] = metadata['etag']
+    if metadata is not None and metadata.get('last_modified'):
+        headers['If-Modified-Since'] = metadata['last_modified']
+
+    try:
+        async with HttpPool().session.get(url, headers=headers) as resp:
+            if resp.status == 304:
+                await _write_metadata(file_path, resp.headers, metadata)
+                return file_path
+            resp.raise_for_status()
             response_bytes = await resp.read()
+            response_headers = resp.headers
+    except Exception as e:
+        # The saved asset is still better than none, and the server isn't asked again for a while
+        logger.warning(f'Could not revalidate {url}: {e!r}')
+        _revalidation_backoffs.set(file_path, True, ttl=revalidation_retry_delay)
+        return file_path
+
+    await asyncio.to_thread(write_atomically, file_path, response_bytes)
+    await DiskCache().add(file_path, len(response_bytes))
+    await _write_metadata(file_path, response_headers)
+    return file_path
+
+
+async def _read_metadata(file_path: str) -> Optional[dict]:
+    metadata = _metadata.get(file_path)
+    if metadata is None:
+        metadata = await asyncio.to_thread(_read_metadata_file, file_path + METADATA_SUFFIX)
+        if metadata is not None:
+            _metadata.set(file_path, metadata)
+    return metadata
 
-    with open(asset_file_path, "wb") as f:
-        f.write(response_bytes)
 
-    return asset_file_path
+def _read_metadata_file(metadata_path: str) -> Optional[dict]:
+    try:
+        with open(metadata_path, 'rb') as f:
+            return loads(f.read())
+    except (OSError, ValueError):
+        return None
 
 
-async def download_and_save_beatmap(beatmap_id) -> str:
-    beatmap_download_url = f"https://osu.ppy.sh/osu/{beatmap_id}"
-    return await download_and_save_asset(beatmap_download_url)
\ No newline at end of file
+async def _write_metadata(file_path: str, headers, previous: Optional[dict] = None):
+    """
+    Saves the validators of the asset from the response headers, keeping the previous ones the response doesn't have
+    """
+    previous = previous or {}
+    metadata = {'etag': headers.get('ETag', previous.get('etag')),
+                'last_modified': headers.get('Last-Modified', previous.get('last_modified')),
+                'fetched_at': time.time()}
+    _metadata.set(file_path, metadata)
+    try:
+        await asyncio.to_thread(write_atomically, file_path + METADATA_SUFFIX, dumps(metadata))
+    except OSError as e:
+        logger.warning(f'Could not save the metadata of {file_path}: {e!r}')
+
+
+async def _download_beatmap(url: str, checksum: str) -> str:
+    async with HttpPool().session.get(url) as resp:
+        resp.raise_for_status()
+        response_bytes = await resp.read()
+
+    file_checksum = await asyncio.to_thread(lambda: hashlib.md5(response_bytes).hexdigest())
+    file_path = beatmap_store_path(file_checksum)
+    await asyncio.to_thread(write_atomically, file_path, response_bytes)
+    await DiskCache().add(file_path, len(response_bytes))
+    if file_checksum != checksum:
+        # The api and the file disagree, e.g. the beatmap was updated after the api response. The file is stored
+        # by what it contains, and used for the api's checksum for a while instead of downloading it every time.
+        logger.debug(f'Downloaded {url} has checksum {file_checksum}, expected {checksum}')
+        _checksum_aliases.set(checksum, file_path, ttl=checksum_alias_ttl)
+    return file_path
+
+
+def write_atomically(file_path: str, contents: bytes):
+    """
+    Writes to a temporary file next to file_path and renames it, so readers never see a partially written file
+    """
+    folder_path, filename = os.path.split(file_path)
+    os.makedirs(folder_path, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=folder_path, prefix=f'.{filename}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contents)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
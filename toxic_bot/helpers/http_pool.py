@@ -0,0 +1,80 @@
+import logging
+
+import aiohttp
+
+from toxic_bot.helpers.primitives import singleton
+
+logger = logging.getLogger('toxic-bot')
+
+
+@singleton
+class HttpPool:
+    """
+    Shared connection pool for every outbound HTTP call of the bot.
+
+    The osu!api wrapper and the asset downloader both use its connector, so connections to
+    osu.ppy.sh and assets.ppy.sh are kept alive and reused between requests.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 20, keepalive_timeout: float = 30,
+                 dns_cache_ttl: int = 300, total_timeout: float = 30, connect_timeout: float = 10):
+        """
+        :param limit: Maximum number of open connections.
+        :param limit_per_host: Maximum number of open connections to one host.
+        :param keepalive_timeout: Seconds an idle connection is kept open.
+        :param dns_cache_ttl: Seconds resolved addresses are cached.
+        :param total_timeout: Seconds a whole request may take.
+        :param connect_timeout: Seconds to wait for a free connection and to connect.
+        """
+        self._connector_options = {'limit': limit,
+                                   'limit_per_host': limit_per_host,
+                                   'keepalive_timeout': keepalive_timeout,
+                                   'use_dns_cache': True,
+                                   'ttl_dns_cache': dns_cache_ttl}
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout)
+        self._connector = None
+        self._session = None
+
+    @property
+    def connector(self) -> aiohttp.TCPConnector:
+        """
+        Shared connector. A new one is created if the pool was closed.
+        """
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(**self._connector_options)
+        return self._connector
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Session on the shared connector, for calls that aren't made through OsuApiV2.
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=self.connector, connector_owner=False,
+                                                  timeout=self.timeout)
+        return self._session
+
+    def stats(self) -> dict:
+        """
+        Returns the utilisation of the pool.
+        """
+        # aiohttp has no public API for the pool state, these are the connector's own bookkeeping
+        connector = self.connector
+        in_use_per_host = {f'{key.host}:{key.port}': len(protocols)
+                           for key, protocols in getattr(connector, '_acquired_per_host', {}).items() if protocols}
+        return {'limit': connector.limit,
+                'limit_per_host': connector.limit_per_host,
+                'in_use': len(getattr(connector, '_acquired', ())),
+                'idle': sum(len(conns) for conns in getattr(connector, '_conns', {}).values()),
+                'waiting': sum(len(waiters) for waiters in getattr(connector, '_waiters', {}).values()),
+                'in_use_per_host': in_use_per_host}
+
+    async def close(self):
+        """
+        Closes the shared session and every pooled connection.
+        """
+        if self._session is not None:
+            await self._session.close()
+        if self._connector is not None:
+            await self._connector.close()
+        logger.debug('Closed HTTP connection pool')
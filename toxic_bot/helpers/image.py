@@ -1,7 +1,6 @@
 import io
 import os
 from re import sub
-from types import SimpleNamespace
 from typing import Any
 
 import nextcord
@@ -11,6 +10,7 @@ from colour import Color
 from ossapi import Mod
 from ossapi.enums import Grade
 
+from toxic_bot.helpers.models import Score, Statistics
 from toxic_bot.helpers.primitives import Point
 
 
@@ -129,7 +129,7 @@ class JudgementsBox:
                         'MEH': (255, 205, 35, 255),
                         'MISS': (240, 20, 30, 255)}
 
-    def __init__(self, judgements: SimpleNamespace, box_width=500):
+    def __init__(self, judgements: Statistics, box_width=500):
         self.judgements = judgements
         self.box_width = box_width
         self.margin = Point(10, 10)
@@ -139,7 +139,7 @@ class JudgementsBox:
     def draw(self, draw: ImageDraw.ImageDraw, position: Point):
         position += self.margin
         for i, (judgement_text, ossapi_attr) in enumerate(self.judgement_mapping.items()):
-            judgement_count = self.judgements.__getattribute__(ossapi_attr)
+            judgement_count = getattr(self.judgements, ossapi_attr)
             judgement_count = self.preprocess_judgement_text(judgement_text, judgement_count)
             judgement_box_width = self.inner_box_width // len(self.judgement_mapping)
             text_box = JudgementTextBox((judgement_text, judgement_count), self.judgement_colors[judgement_text],
@@ -200,7 +200,7 @@ class ScoreBox(JudgementsBox):
                         'COMBO': (255, 255, 255, 255),
                         'ACCURACY': (255, 255, 255, 255)}
 
-    def __init__(self, judgements: SimpleNamespace, box_width=500):
+    def __init__(self, judgements: Score, box_width=500):
         super().__init__(judgements, box_width)
 
 
@@ -323,8 +323,14 @@ class StarRatingTextBox(TextBox):
 
 
 def pillow_image_to_discord_file(image: Image.Image, filename: str):
+    return png_to_discord_file(pillow_image_to_png(image), filename)
+
+
+def pillow_image_to_png(image: Image.Image) -> bytes:
     img_to_send = io.BytesIO()
     image.save(img_to_send, format='PNG')
-    img_to_send.seek(0)
-    file = nextcord.File(img_to_send, filename=filename)
-    return file
+    return img_to_send.getvalue()
+
+
+def png_to_discord_file(png: bytes, filename: str):
+    return nextcord.File(io.BytesIO(png), filename=filename)
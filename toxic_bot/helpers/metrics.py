@@ -0,0 +1,44 @@
+from collections import deque
+from typing import Deque, Dict
+
+
+class LatencyStats:
+    """
+    Keeps running latency figures for one operation.
+
+    Only the most recent samples are kept for percentiles, so memory stays bounded.
+    """
+
+    def __init__(self, max_samples: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples: Deque[float] = deque(maxlen=max_samples)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._samples.append(seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """
+        Returns the given percentile of the recent samples.
+        :param percent: Percentile between 0 and 100.
+        """
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> Dict[str, float]:
+        return {'count': self.count,
+                'mean': self.mean,
+                'p50': self.percentile(50),
+                'p99': self.percentile(99),
+                'max': self.max}
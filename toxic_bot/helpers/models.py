@@ -0,0 +1,160 @@
+import json
+from typing import Any, Dict, List, Optional, Type, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(raw: Union[bytes, str]) -> Any:
+    """
+    Decodes a JSON response, with orjson if it is installed.
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Encodes a value to JSON bytes, with orjson if it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+class ApiObject:
+    """
+    Object view over a decoded osu!api JSON object.
+
+    Fields are read from the decoded dict when they are accessed, and nested objects are only wrapped
+    the first time they are read. Wrapped objects of the `_nested` fields are kept in slots of the
+    same name, other assigned fields are kept apart from the decoded dict, so the same dict can be
+    shared with the response cache.
+    """
+    __slots__ = ('_data', '_fields', '_stale')
+
+    # Model classes of nested objects, other nested objects are wrapped as ApiObject
+    _nested: Dict[str, Type['ApiObject']] = {}
+
+    def __init__(self, data: dict, stale: bool = False):
+        object.__setattr__(self, '_data', data)
+        object.__setattr__(self, '_fields', None)
+        object.__setattr__(self, '_stale', stale)
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ApiObject.__slots__:
+            # Slot isn't set yet, e.g. on copies made without __init__
+            raise AttributeError(name)
+        fields = self._fields
+        if fields is not None and name in fields:
+            return fields[name]
+        try:
+            value = self._data[name]
+        except KeyError:
+            raise AttributeError(f'{type(self).__name__} has no field {name!r}') from None
+
+        if isinstance(value, dict):
+            value = self._nested.get(name, ApiObject)(value, stale=self._stale)
+            setattr(self, name, value)
+        return value
+
+    def __setattr__(self, name: str, value: Any):
+        try:
+            object.__setattr__(self, name, value)
+        except AttributeError:
+            # Not a slot of this model
+            self._set_field(name, value)
+
+    @property
+    def is_stale(self) -> bool:
+        """
+        Whether the object was served from an expired cache entry because osu!api couldn't be reached.
+        """
+        return self._stale
+
+    def __repr__(self):
+        return f'{type(self).__name__}(id={self._data.get("id")!r})'
+
+    def _set_field(self, name: str, value: Any):
+        if self._fields is None:
+            object.__setattr__(self, '_fields', {})
+        self._fields[name] = value
+
+
+class Statistics(ApiObject):
+    __slots__ = ()
+
+    count_300: int
+    count_100: int
+    count_50: int
+    count_miss: int
+
+
+class Beatmapset(ApiObject):
+    __slots__ = ()
+
+    id: int
+    artist: str
+    title: str
+    creator: str
+    status: str
+    video: bool
+    covers: ApiObject
+
+
+class Beatmap(ApiObject):
+    __slots__ = ('beatmapset',)
+    _nested = {'beatmapset': Beatmapset}
+
+    id: int
+    beatmapset_id: int
+    version: str
+    difficulty_rating: float
+    status: str
+    checksum: Optional[str]
+    url: str
+    beatmapset: Beatmapset
+
+
+class User(ApiObject):
+    __slots__ = ('statistics',)
+    _nested = {'statistics': Statistics}
+
+    id: int
+    username: str
+    country_code: str
+    avatar_url: str
+    playmode: str
+    statistics: Statistics
+
+
+class Score(ApiObject):
+    __slots__ = ('beatmap', 'beatmapset', 'user', 'statistics')
+    _nested = {'beatmap': Beatmap,
+               'beatmapset': Beatmapset,
+               'user': User,
+               'statistics': Statistics}
+
+    id: int
+    user_id: int
+    accuracy: float
+    max_combo: int
+    mods: List[str]
+    pp: Optional[float]
+    rank: str
+    created_at: str
+    beatmap: Beatmap
+    beatmapset: Beatmapset
+    user: User
+    statistics: Statistics
+
+
+class BeatmapUserScore(ApiObject):
+    __slots__ = ('score',)
+    _nested = {'score': Score}
+
+    position: int
+    score: Score
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger('toxic-bot')
+
+
+class OsuTokenManager:
+    """
+    Keeps the client credentials token of osu!api v2 fresh.
+
+    The token is refreshed in the background before it expires, and refreshes are done under a lock
+    so only one token request is ever in flight.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, client_id: str, client_secret: str,
+                 token_url: str = 'https://osu.ppy.sh/oauth/token', refresh_margin: int = 300):
+        """
+        :param session: Session used to request tokens.
+        :param client_id: Client ID for the osu!api v2.
+        :param client_secret: Client secret for the osu!api v2.
+        :param token_url: URL of the osu! oauth token endpoint.
+        :param refresh_margin: Seconds before expiry the token is refreshed in the background.
+        """
+        self._session = session
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._token_url = token_url
+        self._refresh_margin = timedelta(seconds=refresh_margin)
+
+        self.access_token: Optional[str] = None
+        self.obtain_date: Optional[datetime] = None
+        self.expire_date: Optional[datetime] = None
+
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get_token(self) -> str:
+        """
+        Returns a valid access token. Only waits for a token request if there is no usable token.
+        """
+        if self.access_token is None or self._expires_soon():
+            await self.refresh()
+        return self.access_token
+
+    async def refresh(self, stale_token: Optional[str] = None):
+        """
+        Requests a new access token.
+        :param stale_token: Token that was rejected. Nothing is requested if another caller already replaced it.
+        """
+        async with self._lock:
+            if self.access_token is not None and self.access_token != stale_token and not self._expires_soon():
+                return
+            await self._request_token()
+
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    def _expires_soon(self) -> bool:
+        return datetime.now() + timedelta(seconds=100) > self.expire_date
+
+    async def _request_token(self):
+        params = {'client_id': self._client_id,
+                  'client_secret': self._client_secret,
+                  'grant_type': 'client_credentials',
+                  'scope': 'public'}
+
+        async with self._session.post(self._token_url, json=params) as r:
+            token_response = await r.json()
+
+        self.access_token = token_response['access_token']
+        self.obtain_date = datetime.now()
+        self.expire_date = self.obtain_date + timedelta(seconds=token_response['expires_in'])
+        logger.debug(f'Obtained osu!api access token, expires at {self.expire_date}')
+
+    async def _refresh_loop(self):
+        while True:
+            refresh_in = (self.expire_date - self._refresh_margin - datetime.now()).total_seconds()
+            await asyncio.sleep(max(refresh_in, 0))
+            try:
+                await self.refresh(stale_token=self.access_token)
+            except Exception:
+                logger.exception('Could not refresh osu!api access token, retrying in 30 seconds')
+                await asyncio.sleep(30)
@@ -1,47 +1,100 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from types import SimpleNamespace
-from typing import List, Dict, Optional, Union, Any
+import random
+import re
+from typing import List, Dict, Optional, Union, Any, Type, AsyncIterator, Iterable, Tuple
+from urllib.parse import urlencode
 
 import aiohttp
-from multidict import CIMultiDict
+
+from toxic_bot.helpers.cache import ResponseCache
+from toxic_bot.helpers.circuit_breaker import CircuitBreaker
+from toxic_bot.helpers.http_pool import HttpPool
+from toxic_bot.helpers.models import ApiObject, Beatmap, BeatmapUserScore, Score, User, dumps, loads
+from toxic_bot.helpers.oauth import OsuTokenManager
+from toxic_bot.helpers.rate_limiter import Priority, RateLimiter
+from toxic_bot.helpers.single_flight import SingleFlight
+from toxic_bot.helpers.username_index import UsernameIndex
 
 logger = logging.getLogger('toxic-bot')
 
 
+class OsuApiUnavailable(Exception):
+    """
+    Raised when osu!api can't be reached or keeps failing, and there is no cached response to fall back to.
+    """
+    pass
+
+
 class OsuApiV2(aiohttp.ClientSession):
     """
     Async wrapper for osu! api v2
     """
 
-    def __init__(self, client_id: str, client_secret: str, osu_session_key: str):
-        super(OsuApiV2, self).__init__()
-        self._default_headers = CIMultiDict()
+    # Seconds each kind of response is cached for, see `_cache_ttl`
+    default_cache_ttls = {'beatmap': 300,
+                          'beatmap_ranked': 7 * 24 * 60 * 60,
+                          'user': 120,
+                          'user_beatmap_score': 60,
+                          'recent_scores': 15,
+                          'scores': 120,
+                          'rankings': 600,
+                          'not_found': 60}
+    # Beatmaps with these statuses can't be updated anymore
+    immutable_beatmap_statuses = ('ranked', 'approved', 'loved')
+    # Maximum number of ids the multiple beatmaps endpoint accepts
+    beatmaps_batch_size = 50
+
+    max_retries = 3
+    retry_base_delay = 0.5
+    # Requests aren't retried if osu! asks us to wait longer than this
+    retry_max_delay = 8
+    # Seconds to wait for a fresh response before falling back to an expired cached one
+    stale_response_timeout = 3
+
+    def __init__(self, client_id: str, client_secret: str, osu_session_key: str,
+                 requests_per_second: float = 1, burst: int = 1,
+                 cache: Optional[ResponseCache] = None, cache_ttls: Optional[Dict[str, float]] = None,
+                 http_pool: Optional[HttpPool] = None, osu_url: str = 'https://osu.ppy.sh',
+                 username_index: Optional[UsernameIndex] = None):
+        http_pool = http_pool if http_pool is not None else HttpPool()
+        super(OsuApiV2, self).__init__(connector=http_pool.connector, connector_owner=False,
+                                       timeout=http_pool.timeout)
         self._osu_client_id = client_id
         self._osu_session_key = osu_session_key
         self._osu_client_secret = client_secret
-        self._osu_api_base_url = 'https://osu.ppy.sh/api/v2/'
-
-        self._osu_access_token = None
-        self._access_token_obtain_date = None
-        self._access_token_expire_date = None
-
-        self._osu_api_cooldown = 1
-        self._last_request_time = datetime.now() - timedelta(seconds=self._osu_api_cooldown)
+        self._osu_url = osu_url
+        self._osu_api_base_url = f'{osu_url}/api/v2/'
+
+        self._token_manager = OsuTokenManager(self, client_id, client_secret, token_url=f'{osu_url}/oauth/token')
+
+        self.rate_limiter = RateLimiter(rate=requests_per_second, burst=burst)
+        self.cache = cache if cache is not None else ResponseCache()
+        self.cache_ttls = {**self.default_cache_ttls, **(cache_ttls or {})}
+        self._in_flight = SingleFlight()
+        self._circuit_breakers: Dict[str, CircuitBreaker] = {}
+        # Refreshed with every user object the API returns
+        self.username_index = username_index
+        # Lookups answered by a cached 404
+        self.not_found_hits = 0
+        # Expired responses served because osu!api failed or was too slow
+        self.stale_responses = 0
 
         return
 
-    async def get_user_beatmap_score(self, user_id: int, beatmap_id: int, mode: str = "osu"):
+    async def get_user_beatmap_score(self, user_id: int, beatmap_id: int, mode: str = "osu",
+                                     priority: Priority = Priority.INTERACTIVE):
         """
         Gets the score for the specified user and beatmap.
         :param user_id: The ID of the user.
         :param beatmap_id: The ID of the beatmap.
         :param mode: Game mode. One of [fruits, mania, osu, taiko]
-        :return: Returns Score object.
+        :param priority: Rate limiter lane of the request.
+        :return: Returns BeatmapUserScore object.
         """
         logger.debug(f'Requesting user score for id: {user_id} and beatmap id: {beatmap_id}')
-        return await self._get_endpoint(f'beatmaps/{beatmap_id}/scores/users/{user_id}')
+        return await self._get_endpoint(f'beatmaps/{beatmap_id}/scores/users/{user_id}', model=BeatmapUserScore,
+                                        priority=priority)
 
     async def get_user_scores(self,
                               user_id: int,
@@ -49,7 +102,8 @@ class OsuApiV2(aiohttp.ClientSession):
                               limit: int = 50,
                               include_fails: Optional[int] = None,
                               mode: Optional[str] = None,
-                              offset: Optional[int] = None) -> List[SimpleNamespace]:
+                              offset: Optional[int] = None,
+                              priority: Priority = Priority.INTERACTIVE) -> List[Score]:
         """
         This endpoint returns the scores of specified user.
         :param user_id: User id.
@@ -58,12 +112,64 @@ class OsuApiV2(aiohttp.ClientSession):
         :param include_fails: Only for recent scores, include scores of failed plays. Set to 1 to include them. Defaults to 0.
         :param mode: GameMode of the scores to be returned. Defaults to the specified user's mode.
         :param offset: Result offset for pagination.
+        :param priority: Rate limiter lane of the request.
         :return: Array of Scores.
         """
         params = {"include_fails": include_fails, "mode": mode, "limit": limit,
                   "offset": offset}
         logger.debug(f'Requesting user {score_type} ranks with {params}')
-        return await self._get_endpoint(f'users/{user_id}/scores/{score_type}', params)
+        return await self._get_endpoint(f'users/{user_id}/scores/{score_type}', params, model=Score,
+                                        priority=priority)
+
+    async def iter_user_scores(self,
+                               user_id: int,
+                               score_type: str,
+                               mode: Optional[str] = None,
+                               include_fails: Optional[int] = None,
+                               max_results: int = 100,
+                               page_size: int = 50,
+                               priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[Score]:
+        """
+        Iterates over the scores of specified user. All pages are requested concurrently within the rate limit,
+        and scores are yielded page by page as the pages arrive, so they are not necessarily in API order.
+        :param user_id: User id.
+        :param score_type: Score type. Must be one of these: best, firsts, recent.
+        :param mode: GameMode of the scores to be returned. Defaults to the specified user's mode.
+        :param include_fails: Only for recent scores, include scores of failed plays. Set to 1 to include them.
+        :param max_results: Maximum number of scores to yield. Remaining requests are cancelled once reached,
+                            or once the caller stops iterating.
+        :param page_size: Number of scores requested per page. osu!api allows at most 50.
+        :param priority: Rate limiter lane of the requests.
+        :return: Async iterator of Scores.
+        """
+        pages = {}
+        for offset in range(0, max_results, page_size):
+            limit = min(page_size, max_results - offset)
+            page = asyncio.ensure_future(self.get_user_scores(user_id, score_type, limit=limit,
+                                                              include_fails=include_fails, mode=mode,
+                                                              offset=offset or None, priority=priority))
+            pages[page] = (offset, limit)
+
+        yielded = 0
+        try:
+            pending = set(pages)
+            while pending and yielded < max_results:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for page in done:
+                    offset, limit = pages[page]
+                    scores = page.result() or []
+                    if len(scores) < limit:
+                        # The user has no scores after this page, later pages would be empty
+                        for later_page in list(pending):
+                            if pages[later_page][0] > offset:
+                                later_page.cancel()
+                                pending.discard(later_page)
+                    for score in scores[:max_results - yielded]:
+                        yielded += 1
+                        yield score
+        finally:
+            for page in pages:
+                page.cancel()
 
     async def get_country_beatmap_scores(self, beatmap_id: int):
         """
@@ -81,13 +187,12 @@ class OsuApiV2(aiohttp.ClientSession):
         }
         logger.debug(f'Requesting country ranks with {params}')
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"https://osu.ppy.sh/beatmaps/{beatmap_id}/scores",
-                                   params=params,
-                                   headers=header) as country_rsp:
-                country_content = await country_rsp.json()
+        async with self.get(f"{self._osu_url}/beatmaps/{beatmap_id}/scores",
+                            params=params,
+                            headers=header) as country_rsp:
+            country_content = await country_rsp.json()
 
-        return self._format_response(country_content["scores"])
+        return self._format_response(country_content["scores"], Score)
 
     async def get_country_top_50(self, country_code: str, game_mode: str = 'osu'):
         """
@@ -100,19 +205,64 @@ class OsuApiV2(aiohttp.ClientSession):
         logger.debug(f'Requesting country top player list with {params}')
         return await self._get_endpoint(f'rankings/{game_mode}/performance', params)
 
-    async def get_beatmap(self, beatmap_id: int):
+    async def get_beatmap(self, beatmap_id: int, priority: Priority = Priority.INTERACTIVE):
         """
         Gets beatmap data for the specified beatmap ID.
         :param beatmap_id: The ID of the beatmap.
+        :param priority: Rate limiter lane of the request.
         :return: Returns Beatmap object.
 
         This endpoint returns a single beatmap object.
         """
         logger.debug(f'Requesting beatmap information for id: {beatmap_id}')
-        return await self._get_endpoint(f'beatmaps/{beatmap_id}')
+        return await self._get_endpoint(f'beatmaps/{beatmap_id}', model=Beatmap, priority=priority)
+
+    async def get_beatmaps(self, beatmap_ids: Iterable[int],
+                           priority: Priority = Priority.INTERACTIVE) -> Dict[int, Beatmap]:
+        """
+        Gets beatmap data for multiple beatmap IDs.
+        Cached beatmaps are not requested again, the rest are requested in batches of 50 ids.
+        Every returned beatmap is cached like a `get_beatmap` response.
+        :param beatmap_ids: IDs of the beatmaps.
+        :param priority: Rate limiter lane of the requests.
+        :return: Beatmap objects keyed by beatmap ID. Beatmaps that weren't found are left out.
+        """
+        beatmaps = {}
+        missing_ids = []
+        for beatmap_id in dict.fromkeys(int(beatmap_id) for beatmap_id in beatmap_ids):
+            cached = await self.cache.get(self._cache_key(f'beatmaps/{beatmap_id}', {}))
+            if cached is None:
+                missing_ids.append(beatmap_id)
+            elif 'error' not in cached:
+                beatmaps[beatmap_id] = Beatmap(cached)
+
+        batches = [missing_ids[i:i + self.beatmaps_batch_size]
+                   for i in range(0, len(missing_ids), self.beatmaps_batch_size)]
+        logger.debug(f'Requesting beatmap information for {len(missing_ids)} ids in {len(batches)} batches')
+        responses = await asyncio.gather(*[self._request_beatmaps_batch(batch, priority) for batch in batches])
+        for batch, response in zip(batches, responses):
+            for beatmap in response.get('beatmaps', []):
+                beatmap_endpoint = f'beatmaps/{beatmap["id"]}'
+                await self.cache.set(self._cache_key(beatmap_endpoint, {}), beatmap,
+                                     ttl=self._cache_ttl(beatmap_endpoint, beatmap), size=len(dumps(beatmap)))
+                beatmaps[beatmap['id']] = Beatmap(beatmap)
+            if 'error' in response:
+                continue
+            # Ids left out of the response don't exist, same as a 404 of get_beatmap
+            for beatmap_id in batch:
+                if beatmap_id not in beatmaps:
+                    await self.cache.set(self._cache_key(f'beatmaps/{beatmap_id}', {}), {'error': 404},
+                                         ttl=self.cache_ttls['not_found'])
+
+        return beatmaps
+
+    async def _request_beatmaps_batch(self, beatmap_ids: List[int], priority: Priority) -> dict:
+        endpoint = f'beatmaps?{urlencode([("ids[]", beatmap_id) for beatmap_id in beatmap_ids])}'
+        # The batch itself isn't cached, its beatmaps are cached one by one
+        return await self._in_flight.do(endpoint, lambda: self._request_endpoint(endpoint, {}, endpoint, priority))
 
     async def get_user(self, user_id: Union[str, int], game_mode: Optional[str] = None,
-                       key: Optional[str] = 'id') -> SimpleNamespace:
+                       key: Optional[str] = 'id', priority: Priority = Priority.INTERACTIVE) -> User:
         """
         This endpoint returns the detail of specified user.
         It's highly recommended to pass key parameter to avoid getting unexpected result
@@ -122,13 +272,43 @@ class OsuApiV2(aiohttp.ClientSession):
                     Can be either id or username to limit lookup by their respective type.
                     Passing empty or invalid value will result in id lookup followed by username lookup if not found.
         :param game_mode: GameMode. User default mode will be used if not specified.
+        :param priority: Rate limiter lane of the request.
         :return:
         """
 
         logger.debug(f'Requesting user information for user: {user_id}')
         params = {'key': key}
         endpoint = f'users/{user_id}/{game_mode}' if game_mode else f'users/{user_id}'
-        return await self._get_endpoint(endpoint=endpoint, params=params)
+        return await self._get_endpoint(endpoint=endpoint, params=params, model=User, priority=priority)
+
+    async def get_user_by_name(self, username: str, game_mode: Optional[str] = None,
+                               priority: Priority = Priority.INTERACTIVE) -> User:
+        """
+        Returns the details of the user with this name. Indexed names are requested by id, so they share
+        the cached responses of id lookups.
+        :param username: Username, case insensitive.
+        :param game_mode: GameMode. User default mode will be used if not specified.
+        :param priority: Rate limiter lane of the request.
+        """
+        user_id = await self.username_index.get(username) if self.username_index is not None else None
+        if user_id is None:
+            return await self.get_user(username, game_mode=game_mode, key='username', priority=priority)
+        return await self.get_user(user_id, game_mode=game_mode, priority=priority)
+
+    async def get_user_id(self, username: str, priority: Priority = Priority.INTERACTIVE) -> Optional[int]:
+        """
+        Returns the id of the user with this name from the username index, or requests the user if it isn't indexed.
+        :param username: Username, case insensitive.
+        :param priority: Rate limiter lane of the request.
+        :return: Id of the user, None if there is no such user.
+        """
+        if self.username_index is not None:
+            user_id = await self.username_index.get(username)
+            if user_id is not None:
+                return user_id
+
+        user = await self.get_user(username, key='username', priority=priority)
+        return user.id if user is not None else None
 
     async def get_beatmap_bytes(self, beatmap_id: int):
         """
@@ -137,44 +317,188 @@ class OsuApiV2(aiohttp.ClientSession):
         :return:
         """
         logger.debug(f'Requesting beatmap bytes for id: {beatmap_id}')
-        async with aiohttp.ClientSession() as c:
-            async with c.get(f'https://osu.ppy.sh/osu/{beatmap_id}') as resp:
-                contents = await resp.read()
+        async with self.get(f'{self._osu_url}/osu/{beatmap_id}') as resp:
+            contents = await resp.read()
         return contents
 
-    async def _get_endpoint(self, endpoint: str, params: dict = None) -> Union[List, SimpleNamespace]:
+    async def _get_endpoint(self, endpoint: str, params: dict = None, model: Type[ApiObject] = ApiObject,
+                            priority: Priority = Priority.INTERACTIVE) -> Union[List[ApiObject], ApiObject]:
         params = self._format_params(params)
-        if self._osu_access_token is None or await self._check_token_expired():
-            await self._get_access_token()
-
-        seconds_since_last_request = (datetime.now() - self._last_request_time).total_seconds()
-        if seconds_since_last_request < self._osu_api_cooldown:
-            await asyncio.sleep(self._osu_api_cooldown - seconds_since_last_request)
+        cache_key = self._cache_key(endpoint, params)
+        # One lookup gives the fresh response, or the stale one to fall back on
+        cached, fresh = await self.cache.lookup(cache_key)
+        if fresh:
+            if isinstance(cached, dict) and 'error' in cached:
+                self.not_found_hits += 1
+            return self._format_response(cached, model)
+
+        stale = cached
+        # Identical concurrent requests share one call, each caller still gets its own parsed objects
+        # With a stale copy the request is kept running after the timeout below, so it can refresh the cache
+        request = self._in_flight.do(cache_key, lambda: self._request_endpoint(endpoint, params, cache_key, priority),
+                                     keep_running=stale is not None)
+        try:
+            if stale is None:
+                contents = await request
+            else:
+                # Don't keep the user waiting on a struggling osu!api when there is an older copy. The request
+                # keeps running in the background and refreshes the cache if it succeeds.
+                contents = await asyncio.wait_for(request, timeout=self.stale_response_timeout)
+        except (OsuApiUnavailable, asyncio.TimeoutError) as e:
+            if stale is None:
+                raise
+            logger.warning(f'Serving stale response of {endpoint} because of {e!r}')
+            self.stale_responses += 1
+            return self._format_response(stale, model, stale=True)
+
+        return self._format_response(contents, model)
+
+    async def _request_endpoint(self, endpoint: str, params: dict, cache_key: str,
+                                priority: Priority) -> Union[List, Dict]:
+        circuit = self._circuit(endpoint)
+        if not circuit.allow_request():
+            raise OsuApiUnavailable(f'osu!api is failing for {circuit.name} requests, please try again a bit later.')
+
+        error = None
+        # Every request the circuit allowed ends in a success or a failure, otherwise a half-open circuit
+        # would wait for its trial forever
+        try:
+            for attempt in range(self.max_retries + 1):
+                retry_after = None
+                try:
+                    status, raw_contents, retry_after = await self._send_request(endpoint, params, priority)
+                    if status == 429 or status >= 500:
+                        raise OsuApiUnavailable(f'osu!api responded with {status}')
+                    if status >= 400:
+                        logger.debug(f'osu!api responded with {status} for {endpoint}')
+                        contents = {'error': status}
+                    else:
+                        contents = loads(raw_contents)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, OsuApiUnavailable) as e:
+                    error = e
+                else:
+                    circuit.record_success()
+                    error = None
+                    break
+
+                delay = self._retry_delay(attempt, retry_after)
+                if attempt == self.max_retries or delay > self.retry_max_delay:
+                    break
+                logger.warning(f'Request to {endpoint} failed with {error!r}, retrying in {delay:.2f} seconds')
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Nobody needs the response anymore, which says nothing about osu!
+            circuit.release_trial()
+            raise
+        except Exception:
+            circuit.record_failure()
+            raise
+
+        if error is None:
+            ttl = self._cache_ttl(endpoint, contents)
+            if ttl is not None:
+                await self.cache.set(cache_key, contents, ttl=ttl, size=len(raw_contents))
+            if self.username_index is not None:
+                await self.username_index.update(self._collect_usernames(contents))
+            return contents
+
+        circuit.record_failure()
+        raise OsuApiUnavailable("Couldn't reach osu!api, please try again a bit later.") from error
+
+    async def _send_request(self, endpoint: str, params: dict, priority: Priority) -> Tuple[int, bytes, Optional[str]]:
+        """
+        Sends one request and returns its status, body and Retry-After header.
+        """
+        for attempt in range(2):
+            token = await self._token_manager.get_token()
+            await self.rate_limiter.acquire(priority)
+            async with self.get(f'{self._osu_api_base_url}{endpoint}', params=params,
+                                headers=self._auth_headers(token)) as resp:
+                raw_contents = await resp.read()
+            if resp.status != 401 or attempt > 0:
+                return resp.status, raw_contents, resp.headers.get('Retry-After')
+            # Token got revoked or expired early, get a new one and replay the request once
+            logger.warning(f'osu!api rejected the access token for {endpoint}, refreshing it')
+            await self._token_manager.refresh(stale_token=token)
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after is not None:
+            try:
+                return float(retry_after) + random.uniform(0, self.retry_base_delay)
+            except ValueError:
+                # osu! sends seconds, HTTP dates are ignored
+                pass
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+
+    def _circuit(self, endpoint: str) -> CircuitBreaker:
+        family = endpoint.split('?')[0].split('/')[0]
+        if family not in self._circuit_breakers:
+            self._circuit_breakers[family] = CircuitBreaker(f'osu!api {family}')
+        return self._circuit_breakers[family]
 
-        async with self.get(f'{self._osu_api_base_url}{endpoint}', params=params) as resp:
-            contents = await resp.json()
+    @staticmethod
+    def _cache_key(endpoint: str, params: dict) -> str:
+        if not params:
+            return endpoint
+        return f'{endpoint}?{urlencode(sorted(params.items()))}'
 
-        self._last_request_time = datetime.now()
+    def _cache_ttl(self, endpoint: str, contents: Union[List, Dict]) -> Optional[float]:
+        """
+        Returns how many seconds the response of the endpoint can be cached for, None if it shouldn't be cached.
+        """
+        if isinstance(contents, dict) and 'error' in contents:
+            # Unknown users, beatmaps and missing scores are remembered for a while, so repeated bad lookups
+            # don't reach osu!
+            if contents['error'] == 404 and re.fullmatch(
+                    r'users/[^/]+(/\w+)?|beatmaps/\d+|beatmaps/\d+/scores/users/\d+', endpoint):
+                return self.cache_ttls['not_found']
+            return None
+        if re.fullmatch(r'beatmaps/\d+', endpoint):
+            if contents.get('status') in self.immutable_beatmap_statuses:
+                return self.cache_ttls['beatmap_ranked']
+            return self.cache_ttls['beatmap']
+        if re.fullmatch(r'beatmaps/\d+/scores/users/\d+', endpoint):
+            return self.cache_ttls['user_beatmap_score']
+        if re.fullmatch(r'users/\d+/scores/recent', endpoint):
+            return self.cache_ttls['recent_scores']
+        if re.fullmatch(r'users/\d+/scores/\w+', endpoint):
+            return self.cache_ttls['scores']
+        if endpoint.startswith('users/'):
+            return self.cache_ttls['user']
+        if endpoint.startswith('rankings/'):
+            return self.cache_ttls['rankings']
+        return None
 
-        return self._format_response(contents)
+    @staticmethod
+    def _collect_usernames(contents: Union[List, Dict]) -> Dict[str, int]:
+        """
+        Returns the username and id of every user object in a response: users, and the users of scores and rankings.
+        """
+        if isinstance(contents, list):
+            objects = contents
+        else:
+            objects = [contents, contents.get('score'), *(contents.get('scores') or ()),
+                       *(contents.get('ranking') or ())]
+
+        users = {}
+        for obj in objects:
+            if not isinstance(obj, dict):
+                continue
+            for user in (obj, obj.get('user')):
+                if isinstance(user, dict) and 'username' in user and 'id' in user:
+                    users[user['username']] = user['id']
+        return users
 
-    def _format_response(self, response: Union[List, Dict]) -> Union[List, SimpleNamespace, Any]:
+    @staticmethod
+    def _format_response(response: Union[List, Dict], model: Type[ApiObject] = ApiObject,
+                         stale: bool = False) -> Union[List[ApiObject], ApiObject, Any]:
         if 'error' in response:
             return None
         if isinstance(response, list):
-            return [self._format_dict(r) for r in response]
+            return [model(r, stale=stale) for r in response]
         elif isinstance(response, dict):
-            return self._format_dict(response)
-
-    def _format_dict(self, d: dict) -> SimpleNamespace:
-        new_dict = {}
-        for key, value in d.items():
-            if isinstance(value, dict):
-                new_dict[key] = self._format_dict(value)
-            else:
-                new_dict[key] = value
-        else:
-            return SimpleNamespace(**new_dict)
+            return model(response, stale=stale)
 
     @staticmethod
     def _format_params(params: Optional[dict]) -> dict:
@@ -187,22 +511,22 @@ class OsuApiV2(aiohttp.ClientSession):
         [params.pop(key) for key in keys_to_pop]
         return params
 
-    async def _get_access_token(self):
-        params = {'client_id': self._osu_client_id,
-                  'client_secret': self._osu_client_secret,
-                  'grant_type': 'client_credentials',
-                  'scope': 'public'}
-
-        async with aiohttp.ClientSession() as c:
-            async with c.post('https://osu.ppy.sh/oauth/token', json=params) as r:
-                token_response = await r.json()
-
-        self._osu_access_token = token_response['access_token']
-        self._access_token_obtain_date = datetime.now()
-        self._access_token_expire_date = self._access_token_obtain_date + timedelta(
-            seconds=token_response['expires_in'])
-
-        self._default_headers = CIMultiDict({'Authorization': f'Bearer {self._osu_access_token}'})
+    @staticmethod
+    def _auth_headers(token: str) -> dict:
+        return {'Authorization': f'Bearer {token}'}
 
-    async def _check_token_expired(self):
-        return datetime.now() + timedelta(seconds=100) > self._access_token_expire_date
+    def stats(self) -> dict:
+        """
+        Returns rate limiter, cache and circuit breaker figures of the wrapper.
+        """
+        return {'rate_limiter': self.rate_limiter.stats(),
+                'cache': self.cache.stats(),
+                'not_found_hits': self.not_found_hits,
+                'stale_responses': self.stale_responses,
+                'in_flight': len(self._in_flight),
+                'username_index': self.username_index.stats() if self.username_index is not None else None,
+                'circuits': {name: circuit.state for name, circuit in self._circuit_breakers.items()}}
+
+    async def close(self) -> None:
+        await self._token_manager.close()
+        await super().close()
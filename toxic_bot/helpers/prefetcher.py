@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from toxic_bot.helpers.http_downloader import download_and_save_asset, download_and_save_beatmap
+from toxic_bot.helpers.models import Score
+
+logger = logging.getLogger('toxic-bot')
+
+
+class AssetPrefetcher:
+    """
+    Downloads the beatmap files and covers of listed scores in the background, so showing another
+    score of the same list finds them on disk.
+
+    Downloads run with bounded concurrency and stop once a run has downloaded its byte budget.
+    A new run with the same key, e.g. the same channel, cancels the previous one.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_bytes: int = 32 * 1024 * 1024, max_scores: int = 25):
+        """
+        :param max_concurrency: Downloads a run makes at the same time.
+        :param max_bytes: Bytes a run downloads before it stops.
+        :param max_scores: Scores of a list whose assets are downloaded, the closest to the shown score first.
+        """
+        self.max_concurrency = max_concurrency
+        self.max_bytes = max_bytes
+        self.max_scores = max_scores
+        self._runs: Dict[Hashable, asyncio.Task] = {}
+
+        self.prefetched = 0
+        self.prefetched_bytes = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def prefetch(self, key: Hashable, scores: List[Score], index: int = 0) -> asyncio.Task:
+        """
+        Starts downloading the assets of the scores next to the shown one.
+        :param key: Identity of the run, an earlier run with the same key is cancelled.
+        :param scores: Listed scores.
+        :param index: Index of the shown score, its assets are already downloaded.
+        :return: Task of the run.
+        """
+        previous = self._runs.pop(key, None)
+        if previous is not None and not previous.done():
+            previous.cancel()
+            self.cancelled += 1
+
+        run = asyncio.ensure_future(self._run(self._downloads(scores, index)))
+        self._runs[key] = run
+        run.add_done_callback(lambda done_run: self._forget(key, done_run))
+        return run
+
+    async def close(self):
+        """
+        Cancels the running downloads.
+        """
+        runs = list(self._runs.values())
+        for run in runs:
+            run.cancel()
+        await asyncio.gather(*runs, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {'running': len(self._runs),
+                'prefetched': self.prefetched,
+                'prefetched_bytes': self.prefetched_bytes,
+                'errors': self.errors,
+                'cancelled': self.cancelled}
+
+    def _forget(self, key: Hashable, run: asyncio.Task):
+        if self._runs.get(key) is run:
+            del self._runs[key]
+
+    def _downloads(self, scores: List[Score], index: int) -> List[Tuple[str, tuple]]:
+        """
+        Returns the downloads of the scores around index, closest first, without duplicates.
+        """
+        others = sorted((i for i in range(len(scores)) if i != index), key=lambda i: (abs(i - index), i))
+        downloads = []
+        seen = set()
+        for i in others[:self.max_scores]:
+            score = scores[i]
+            if not hasattr(score, 'beatmap'):
+                score = score.score
+            beatmap = getattr(score, 'beatmap', None)
+            if beatmap is not None and ('beatmap', beatmap.id) not in seen:
+                seen.add(('beatmap', beatmap.id))
+                downloads.append(('beatmap', (beatmap.id, getattr(beatmap, 'checksum', None))))
+            covers = getattr(getattr(score, 'beatmapset', None), 'covers', None)
+            cover_url = getattr(covers, 'card@2x', None)
+            if cover_url is not None and cover_url not in seen:
+                seen.add(cover_url)
+                downloads.append(('asset', (cover_url,)))
+        return downloads
+
+    async def _run(self, downloads: List[Tuple[str, tuple]]):
+        queue = list(reversed(downloads))
+        run_bytes = 0
+
+        async def worker():
+            nonlocal run_bytes
+            while queue and run_bytes < self.max_bytes:
+                kind, args = queue.pop()
+                try:
+                    if kind == 'beatmap':
+                        path = await download_and_save_beatmap(*args)
+                    else:
+                        path = await download_and_save_asset(*args)
+                    size = await asyncio.to_thread(self._file_size, path)
+                except Exception as e:
+                    self.errors += 1
+                    logger.debug(f'Could not prefetch {args[0]}: {e!r}')
+                    continue
+                # Files that were already on disk count too, so a run over a long list stays bounded
+                run_bytes += size or 0
+                self.prefetched += 1
+                self.prefetched_bytes += size or 0
+
+        await asyncio.gather(*[worker() for _ in range(min(self.max_concurrency, len(downloads)))])
+
+    @staticmethod
+    def _file_size(path: str) -> Optional[int]:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return None
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Deque, Dict, Optional
+
+from toxic_bot.helpers.metrics import LatencyStats
+
+logger = logging.getLogger('toxic-bot')
+
+
+class Priority(IntEnum):
+    """
+    Request lanes of the rate limiter. Lower values are served first.
+    """
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class RateLimiter:
+    """
+    Async token bucket rate limiter.
+
+    Tokens are refilled at `rate` per second up to `burst`. Callers that can't get a token right away
+    wait in a FIFO queue of their priority lane, and waiting interactive calls are always served
+    before waiting background calls.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError('Rate must be positive.')
+        if burst < 1:
+            raise ValueError('Burst must be at least 1.')
+        self.rate = rate
+        self.burst = burst
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lanes: Dict[Priority, Deque[asyncio.Future]] = {priority: deque() for priority in Priority}
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self.acquired: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self.wait_times: Dict[Priority, LatencyStats] = {priority: LatencyStats() for priority in Priority}
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE):
+        """
+        Waits until a request is allowed to be sent.
+        :param priority: Lane to wait in.
+        """
+        start = time.monotonic()
+        self._refill()
+
+        # Only skip the queue when nobody is waiting, otherwise FIFO order would be broken.
+        if self._tokens >= 1 and self.queue_depth == 0:
+            self._tokens -= 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._lanes[priority].append(waiter)
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.create_task(self._dispatch())
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # We were handed a token but got cancelled before using it, give it back.
+                    self._tokens = min(self.burst, self._tokens + 1)
+                raise
+
+        self.acquired[priority] += 1
+        self.wait_times[priority].add(time.monotonic() - start)
+
+    def stats(self) -> dict:
+        """
+        Returns queue depth and wait time figures of every lane.
+        """
+        self._refill()
+        return {'rate': self.rate,
+                'burst': self.burst,
+                'tokens': self._tokens,
+                'queue_depth': {priority.name.lower(): len(lane) for priority, lane in self._lanes.items()},
+                'acquired': {priority.name.lower(): count for priority, count in self.acquired.items()},
+                'wait': {priority.name.lower(): stats.summary() for priority, stats in self.wait_times.items()}}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _next_lane(self) -> Optional[Deque[asyncio.Future]]:
+        for priority in Priority:
+            lane = self._lanes[priority]
+            while lane and lane[0].done():
+                # Drop waiters that were cancelled while queued
+                lane.popleft()
+            if lane:
+                return lane
+        return None
+
+    async def _dispatch(self):
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                return
+
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                # A higher priority waiter might have arrived while sleeping, look again.
+                continue
+
+            self._tokens -= 1
+            lane.popleft().set_result(None)
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from toxic_bot.helpers.cache import TTLCache
+
+logger = logging.getLogger('toxic-bot')
+
+
+class RenderCache:
+    """
+    Cache of rendered card images, kept as encoded PNG bytes.
+
+    Renders are kept in memory and, if a directory is given, on disk so they survive restarts.
+    Both tiers are bounded by total size and evict the least recently used renders first.
+    """
+
+    def __init__(self, max_memory_bytes: int = 32 * 1024 * 1024, directory: Optional[str] = None,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        """
+        :param max_memory_bytes: Maximum total size of the renders kept in memory.
+        :param directory: Directory renders are saved to. Renders are only kept in memory if not given.
+        :param max_disk_bytes: Maximum total size of the renders saved to disk.
+        """
+        self._memory = TTLCache(max_entries=4096, max_size=max_memory_bytes, sizeof=len)
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        # File name -> size, in least recently used order. Read from the directory on first use.
+        self._disk_index: Optional['OrderedDict[str, int]'] = None
+        self._disk_lock = asyncio.Lock()
+        self.disk_size = 0
+
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the cached render, or None if it isn't cached.
+        """
+        png = self._memory.get(key)
+        if png is not None:
+            return png
+
+        if self.directory is not None:
+            filename = self._filename(key)
+            async with self._disk_lock:
+                index = await self._index()
+                if filename in index:
+                    index.move_to_end(filename)
+                    try:
+                        png = await asyncio.to_thread(self._read, filename)
+                    except OSError as e:
+                        logger.warning(f'Could not read render {filename}: {e!r}')
+                        self.disk_size -= index.pop(filename)
+            if png is not None:
+                self.disk_hits += 1
+                self._memory.set(key, png)
+                return png
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, png: bytes):
+        """
+        Stores a render.
+        :param key: Key of the render, it must change whenever the rendered image would.
+        :param png: Encoded image.
+        """
+        self._memory.set(key, png)
+        if self.directory is None or len(png) > self.max_disk_bytes:
+            return
+
+        filename = self._filename(key)
+        async with self._disk_lock:
+            index = await self._index()
+            try:
+                await asyncio.to_thread(self._write, filename, png)
+            except OSError as e:
+                logger.warning(f'Could not save render {filename}: {e!r}')
+                return
+
+            self.disk_size += len(png) - index.pop(filename, 0)
+            index[filename] = len(png)
+            evicted = []
+            while self.disk_size > self.max_disk_bytes:
+                evicted_filename, size = index.popitem(last=False)
+                self.disk_size -= size
+                evicted.append(evicted_filename)
+            if evicted:
+                await asyncio.to_thread(self._remove, evicted)
+
+    def stats(self) -> dict:
+        memory = self._memory.stats()
+        lookups = memory['hits'] + self.disk_hits + self.misses
+        return {'memory_entries': memory['entries'],
+                'memory_bytes': memory['size'],
+                'memory_hits': memory['hits'],
+                'disk_entries': len(self._disk_index) if self._disk_index is not None else None,
+                'disk_bytes': self.disk_size,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (memory['hits'] + self.disk_hits) / lookups if lookups else 0.0}
+
+    @staticmethod
+    def _filename(key: str) -> str:
+        return f'{hashlib.sha1(key.encode("utf-8")).hexdigest()}.png'
+
+    async def _index(self) -> 'OrderedDict[str, int]':
+        if self._disk_index is None:
+            sizes = await asyncio.to_thread(self._scan)
+            self._disk_index = OrderedDict(sizes)
+            self.disk_size = sum(sizes.values())
+        return self._disk_index
+
+    def _scan(self) -> Dict[str, int]:
+        """
+        Returns the size of every saved render, oldest first.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith('.png'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        return {name: size for _, name, size in sorted(entries)}
+
+    def _read(self, filename: str) -> bytes:
+        path = os.path.join(self.directory, filename)
+        with open(path, 'rb') as f:
+            png = f.read()
+        # Keeps the recently used order across restarts
+        os.utime(path)
+        return png
+
+    def _write(self, filename: str, png: bytes):
+        path = os.path.join(self.directory, filename)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(png)
+        os.replace(temp_path, path)
+
+    def _remove(self, filenames):
+        for filename in filenames:
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
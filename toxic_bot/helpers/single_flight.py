@@ -0,0 +1,69 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Set, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one.
+
+    The first caller of a key starts the call, every caller that comes while it is still running
+    waits for the same result. The call runs in its own task, so cancelling a waiter doesn't
+    cancel it for the others. Once every waiter is cancelled the call is cancelled too, unless
+    one of them asked for it to keep running.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        # Key -> number of callers waiting on the call
+        self._waiters: Dict[Hashable, int] = {}
+        # Keys whose call finishes even if nobody waits for it
+        self._detached: Set[Hashable] = set()
+        self.started = 0
+        self.shared = 0
+        self.cancelled = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]], keep_running: bool = False) -> T:
+        """
+        Runs func, or joins its already running call with the same key.
+        :param key: Identity of the call.
+        :param func: Function that returns the awaitable to run.
+        :param keep_running: Let the call finish even if this caller is cancelled, e.g. to fill a cache.
+        :return: Result of the call.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(func())
+            self._calls[key] = call
+            self._waiters[key] = 0
+            call.add_done_callback(lambda done_call: self._forget(key, done_call))
+            self.started += 1
+        else:
+            self.shared += 1
+        if keep_running:
+            self._detached.add(key)
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(call)
+        except asyncio.CancelledError:
+            if self._calls.get(key) is call:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0 and key not in self._detached and not call.done():
+                    # Nobody needs the result anymore
+                    call.cancel()
+                    self.cancelled += 1
+            raise
+
+    def _forget(self, key: Hashable, call: asyncio.Future):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+            del self._waiters[key]
+            self._detached.discard(key)
+        if not call.cancelled():
+            # Mark the exception as retrieved in case every waiter was cancelled
+            call.exception()
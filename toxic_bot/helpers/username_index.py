@@ -0,0 +1,86 @@
+import logging
+from typing import Dict, Optional
+
+from toxic_bot.helpers.cache import TTLCache
+
+logger = logging.getLogger('toxic-bot')
+
+
+class UsernameIndex:
+    """
+    Case-insensitive index of osu! usernames to user ids, shared by every bot process through Redis.
+
+    Entries expire after `ttl` seconds, so names that were changed or taken over by another user are
+    eventually resolved again. Recently used names are also kept in memory.
+    """
+
+    def __init__(self, database, ttl: float = 7 * 24 * 60 * 60, max_local_entries: int = 10000,
+                 local_ttl: float = 10 * 60):
+        """
+        :param database: Database whose Redis client stores the index. Only memory is used until it is initialized.
+        :param ttl: Seconds a username stays in Redis after it was last seen.
+        :param max_local_entries: Maximum number of usernames kept in memory.
+        :param local_ttl: Seconds a username is kept in memory.
+        """
+        self._database = database
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self._local = TTLCache(max_entries=max_local_entries)
+        self.errors = 0
+
+    @staticmethod
+    def _key(username: str) -> str:
+        return f'username:{username.lower()}'
+
+    async def get(self, username: str) -> Optional[int]:
+        """
+        Returns the id of the user with this name, or None if it isn't indexed.
+        """
+        user_id = self._local.get(username.lower())
+        if user_id is not None:
+            return user_id
+
+        redis = getattr(self._database, 'c', None)
+        if redis is None:
+            return None
+        try:
+            user_id = await redis.get(self._key(username))
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f'Could not read username {username} from the index: {e!r}')
+            return None
+        if user_id is None:
+            return None
+
+        user_id = int(user_id)
+        self._local.set(username.lower(), user_id, ttl=self.local_ttl)
+        return user_id
+
+    async def update(self, users: Dict[str, int]):
+        """
+        Adds usernames to the index, or refreshes them.
+        :param users: Username to user id of the users that were seen.
+        """
+        # Names seen moments ago don't need another write
+        users = {username.lower(): user_id for username, user_id in users.items()
+                 if self._local.get(username.lower()) != user_id}
+        if not users:
+            return
+
+        for username, user_id in users.items():
+            self._local.set(username, user_id, ttl=self.local_ttl)
+
+        redis = getattr(self._database, 'c', None)
+        if redis is None:
+            return
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for username, user_id in users.items():
+                    pipe.set(self._key(username), user_id, ex=int(self.ttl))
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f'Could not write {len(users)} usernames to the index: {e!r}')
+
+    def stats(self) -> dict:
+        return {**self._local.stats(), 'errors': self.errors}
@@ -26,6 +26,21 @@ parser.add_argument('--redirect_uri', type=str, default='https://auth.ronnia.me/
                     help='Redirect uri, required for linking osu! account.')
 parser.add_argument('--osu_session_key', type=str, required=True,
                     help='Osu session key, required for country leaderboards.')
+parser.add_argument('--osu_api_rate', type=float, default=1,
+                    help='Sustained osu!api v2 requests per second. Default is 1.')
+parser.add_argument('--osu_api_burst', type=int, default=1,
+                    help='Number of osu!api v2 requests that can be sent at once before rate limiting. Default is 1.')
+parser.add_argument('--redis_max_connections', type=int, default=50,
+                    help='Maximum number of pooled Redis connections. Default is 50.')
+parser.add_argument('--redis_timeout', type=float, default=2,
+                    help='Seconds a Redis connection attempt or command may take before failing. Default is 2.')
+parser.add_argument('--asset_cache_size', type=int, default=2048,
+                    help='Disk budget of downloaded assets and beatmaps in MiB. Default is 2048.')
+parser.add_argument('--asset_cache_policy', type=str, default='lru', choices=['lru', 'lfu'],
+                    help='Which downloaded assets are deleted first when the budget is exceeded. Default is lru.')
+parser.add_argument('--stats_log_interval', type=float, default=15 * 60,
+                    help='Seconds between two logs of the cache, pool and osu!api stats, 0 disables them. '
+                         'Default is 900.')
 
 args = parser.parse_args()
 
@@ -59,6 +74,13 @@ bot = DiscordOsuBot(default_prefix=default_prefix,
                     description=f"heyrullah the osu! bot. {default_prefix} is my default prefix",
                     osu_redirect_uri=args.redirect_uri,
                     osu_session_key=args.osu_session_key,
+                    osu_api_rate=args.osu_api_rate,
+                    osu_api_burst=args.osu_api_burst,
+                    redis_max_connections=args.redis_max_connections,
+                    redis_timeout=args.redis_timeout,
+                    asset_cache_size=args.asset_cache_size,
+                    asset_cache_policy=args.asset_cache_policy,
+                    stats_log_interval=args.stats_log_interval,
                     intents=intents)
 
 